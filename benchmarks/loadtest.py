@@ -0,0 +1,300 @@
+import argparse
+import contextlib
+import http.client
+import importlib.util
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pipeline import (  # noqa: E402
+    FIXTURE_PATCH,
+    champions_assets,
+    load_fixtures,
+    scale,
+)
+
+BACKENDS = ("werkzeug", "werkzeug-single", "waitress")
+
+
+def fixture_snapshot(factor: int = 1):
+    from services.opgg import OPGG
+    from services.stream import Snapshot
+
+    names, payloads = scale(*load_fixtures(), factor)
+    with champions_assets(names), contextlib.redirect_stdout(io.StringIO()):
+        service = OPGG(cache=None, patch=FIXTURE_PATCH, offline=True)
+        service.response_data = payloads["op.gg"]
+        service._sanitize_data()
+
+    import project
+
+    df = project._stats_to_dataframe(service.columns)
+    df.sort_values("Winrate", ascending=False, inplace=True)
+    df.set_index("ChampionId", inplace=True)
+    return Snapshot.from_dataframe(df)
+
+
+def serve(backend: str, port: int, factor: int, threads: int) -> None:
+    from services.stream import create_app
+
+    app = create_app(fixture_snapshot(factor))
+    match backend:
+        case "werkzeug" | "werkzeug-single":
+            # The same server app.run starts for --stream, quiet like it.
+            import logging
+
+            from werkzeug.serving import make_server
+
+            logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+            make_server(
+                "127.0.0.1", port, app, threaded=backend == "werkzeug"
+            ).serve_forever()
+        case "waitress":
+            from waitress import serve as waitress_serve
+
+            waitress_serve(
+                app, host="127.0.0.1", port=port, threads=threads, _quiet=True
+            )
+
+
+def available(backend: str) -> bool:
+    return backend != "waitress" or importlib.util.find_spec("waitress") is not None
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"Server didn't start listening on port {port}")
+
+
+def parse_mix(spec: str) -> tuple[list[str], list[float]]:
+    paths, weights = [], []
+    for item in spec.split(","):
+        # The weight follows the last "=", a query string in the path has its own.
+        path, _, weight = item.rpartition("=") if "=" in item else (item, "", "")
+        paths.append(path.strip())
+        weights.append(float(weight or 1))
+    return paths, weights
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return math.nan
+    return samples[min(len(samples) - 1, int(math.ceil(fraction * len(samples))) - 1)]
+
+
+def run_load(
+    url: str,
+    concurrency: int,
+    duration: float,
+    mix: tuple[list[str], list[float]],
+    accept_encoding: str,
+    conditional: float,
+) -> dict:
+    target = urlsplit(url)
+    paths, weights = mix
+    deadline = time.perf_counter() + duration
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    counters = {"failures": 0, "rejected": 0, "bytes": 0}
+    lock = threading.Lock()
+
+    def worker(seed: int) -> None:
+        rng = random.Random(seed)
+        etags: dict[str, str] = {}
+        connection = None
+        local_latencies, local_statuses = [], {}
+        failures = rejected = received = 0
+        while time.perf_counter() < deadline:
+            path = rng.choices(paths, weights)[0]
+            headers = {"Accept-Encoding": accept_encoding}
+            # A share of clients revalidate like a polling dashboard would.
+            if path in etags and rng.random() < conditional:
+                headers["If-None-Match"] = etags[path]
+            start = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = http.client.HTTPConnection(
+                        target.hostname, target.port, timeout=30
+                    )
+                connection.request(
+                    "GET", target.path.rstrip("/") + path, headers=headers
+                )
+                response = connection.getresponse()
+                body = response.read()
+                elapsed = time.perf_counter() - start
+                if response.getheader("ETag"):
+                    etags[path] = response.getheader("ETag")
+                if response.will_close:
+                    connection.close()
+                    connection = None
+            except (OSError, http.client.HTTPException):
+                failures += 1
+                if connection is not None:
+                    connection.close()
+                connection = None
+                continue
+
+            local_latencies.append(elapsed)
+            status = str(response.status)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+            received += len(body)
+            if response.status not in (200, 304):
+                rejected += 1
+
+        if connection is not None:
+            connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+            counters["failures"] += failures
+            counters["rejected"] += rejected
+            counters["bytes"] += received
+
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=worker, args=(seed,)) for seed in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    # Connection failures have no latency sample, but they still count as attempts.
+    attempts = len(latencies) + counters["failures"]
+    errors = counters["failures"] + counters["rejected"]
+    return {
+        "requests": attempts,
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "error_rate": errors / attempts if attempts else 0.0,
+        "mb_per_s": counters["bytes"] / elapsed / 2**20,
+        "statuses": statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Drive the --stream endpoints with concurrent clients"
+    )
+    parser.add_argument(
+        "-b",
+        "--backends",
+        default="werkzeug,waitress",
+        help=f"Comma separated servers to compare, options: {{{', '.join(BACKENDS)}}}",
+    )
+    parser.add_argument(
+        "--url", help="Load an already running server instead of starting backends"
+    )
+    parser.add_argument("-c", "--concurrency", default="1,8,32")
+    parser.add_argument("-d", "--duration", type=float, default=10.0)
+    parser.add_argument(
+        "--mix",
+        default="/=1,/json=3",
+        help="Comma separated PATH=WEIGHT request mix, a path with a query string needs its weight, default: /=1,/json=3",
+    )
+    parser.add_argument("--accept-encoding", default="gzip")
+    parser.add_argument(
+        "--conditional",
+        type=float,
+        default=0.0,
+        help="Share of requests sent with If-None-Match once an ETag was seen",
+    )
+    parser.add_argument(
+        "--scale", type=int, default=1, help="Multiplier of the fixture rows served"
+    )
+    parser.add_argument(
+        "--threads", type=int, default=8, help="Worker threads of pooled backends"
+    )
+    parser.add_argument("-o", "--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+    if args.url:
+        targets = [("url", args.url)]
+    else:
+        targets = []
+        for backend in args.backends.split(","):
+            if backend not in BACKENDS:
+                parser.error(f'Invalid backend: "{backend}"')
+            if not available(backend):
+                print(f"Skipping {backend}: not installed", file=sys.stderr)
+                continue
+            targets.append((backend, None))
+
+    results = []
+    print(
+        f"{'Backend':<18}{'Clients':>8}{'Req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'Errors':>8}{'MiB/s':>8}"
+    )
+    for backend, url in targets:
+        server = None
+        if url is None:
+            port = free_port()
+            # Its own process, so the clients don't share a GIL with the server.
+            server = multiprocessing.Process(
+                target=serve,
+                args=(backend, port, args.scale, args.threads),
+                daemon=True,
+            )
+            server.start()
+            wait_for_port(port)
+            url = f"http://127.0.0.1:{port}"
+        try:
+            for concurrency in concurrency_levels:
+                result = run_load(
+                    url,
+                    concurrency,
+                    args.duration,
+                    mix,
+                    args.accept_encoding,
+                    args.conditional,
+                )
+                results.append(
+                    {"backend": backend, "concurrency": concurrency, **result}
+                )
+                print(
+                    f"{backend:<18}{concurrency:>8}{result['throughput']:>10.1f}"
+                    f"{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+                    f"{result['error_rate']:>8.1%}{result['mb_per_s']:>8.2f}"
+                )
+        finally:
+            if server is not None:
+                server.terminate()
+                server.join()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
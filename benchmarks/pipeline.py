@@ -0,0 +1,393 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+sys.path.insert(0, ROOT)
+
+import project  # noqa: E402
+from services import registry  # noqa: E402
+from services.utils import Providers  # noqa: E402
+
+PROVIDERS = {"op.gg": Providers.OP_GG, "blitz.gg": Providers.BLITZ_GG}
+PLOT_TOP = 200
+ROLES = ("TOP", "JUNGLE", "MID", "ADC", "SUPPORT")
+# Services are pinned to the fixture names, an unpinned one would sync the real assets.
+FIXTURE_PATCH = "fixture"
+
+
+def load_fixtures() -> tuple[dict[str, str], dict[str, dict]]:
+    # Recorded payloads win, a deterministic synthetic set with the same shape
+    # is used when nothing was recorded yet.
+    try:
+        with open(os.path.join(FIXTURES_DIR, "champions_names_by_id.json")) as f:
+            names = json.load(f)
+        payloads = {}
+        for provider in PROVIDERS:
+            with open(os.path.join(FIXTURES_DIR, f"{provider}.json")) as f:
+                payloads[provider] = json.load(f)
+        return names, payloads
+    except FileNotFoundError:
+        return synthesize(170)
+
+
+def synthesize(champions: int, seed: int = 0) -> tuple[dict[str, str], dict[str, dict]]:
+    rng = random.Random(seed)
+    names = {str(i): f"Champion{i}" for i in range(1, champions + 1)}
+    # A few champions missing from each provider keeps the completion stage busy.
+    opgg, blitz = [], []
+    for champion_id in range(1, champions + 1):
+        games = rng.randint(100, 100_000)
+        wins = int(games * rng.uniform(0.4, 0.6))
+        if champion_id % 50:
+            opgg.append({"champion_id": champion_id, "play": games, "win": wins})
+        if champion_id % 40:
+            blitz.append(
+                {
+                    "championId": champion_id,
+                    "role": rng.choice(ROLES),
+                    "patch": "13.14",
+                    "wins": wins,
+                    "games": games,
+                    "tierListTier": None,
+                }
+            )
+
+    return names, {
+        "op.gg": {"data": opgg, "meta": {}},
+        "blitz.gg": {"data": {"allChampionStats": blitz}},
+    }
+
+
+def scale(
+    names: dict[str, str], payloads: dict[str, dict], factor: int
+) -> tuple[dict[str, str], dict[str, dict]]:
+    # Copies of every champion under new IDs, so the data grows like wider sweeps would.
+    if factor == 1:
+        return names, payloads
+
+    offset = max(int(champion_id) for champion_id in names)
+    scaled_names = {}
+    opgg, blitz = [], []
+    for copy in range(factor):
+        shift = copy * offset
+        for champion_id, name in names.items():
+            scaled_names[str(int(champion_id) + shift)] = f"{name}#{copy}"
+        opgg += [
+            {**record, "champion_id": record["champion_id"] + shift}
+            for record in payloads["op.gg"]["data"]
+        ]
+        blitz += [
+            {**record, "championId": record["championId"] + shift}
+            for record in payloads["blitz.gg"]["data"]["allChampionStats"]
+        ]
+
+    return scaled_names, {
+        "op.gg": {"data": opgg, "meta": {}},
+        "blitz.gg": {"data": {"allChampionStats": blitz}},
+    }
+
+
+@contextlib.contextmanager
+def stand_in_server(payloads: dict[str, dict]):
+    bodies = {
+        f"/{provider}": json.dumps(payload).encode()
+        for provider, payload in payloads.items()
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            body = bodies.get(self.path.split("?")[0])
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    links = dict(Providers.fetch_links)
+    for provider, name in PROVIDERS.items():
+        Providers.fetch_links[
+            name
+        ] = f"http://127.0.0.1:{server.server_port}/{provider}"
+    try:
+        yield
+    finally:
+        Providers.fetch_links.update(links)
+        server.shutdown()
+        server.server_close()
+
+
+@contextlib.contextmanager
+def champions_assets(names: dict[str, str]):
+    assets_dir = registry.ASSETS_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        registry.ASSETS_DIR = tmp
+        for path in (registry.names_path(), registry.names_path(FIXTURE_PATCH)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(names, f)
+        registry.clear_registries()
+        try:
+            yield
+        finally:
+            registry.ASSETS_DIR = assets_dir
+            registry.clear_registries()
+
+
+def timed(function, repeat: int) -> dict[str, float]:
+    # One untimed run first, so lazy imports and caches don't land in the samples.
+    samples = []
+    for _ in range(repeat + 1):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function()
+            samples.append(time.perf_counter() - start)
+
+    samples = samples[1:]
+    return {"min": min(samples), "median": statistics.median(samples)}
+
+
+def bench_provider(provider: str, payload: dict, repeat: int) -> dict:
+    from services.transport import create_session
+
+    service_class = project.get_provider_class(provider)
+    # No rate limiter, the stand-in server is local and the limits would be timed instead.
+    session = create_session(rate_limiter=None)
+
+    def new_services(**fields) -> list:
+        # Built ahead of the timed runs, each run gets its own and the registry
+        # setup of the constructor stays out of the samples.
+        with contextlib.redirect_stdout(io.StringIO()):
+            return [
+                service_class(
+                    session=session, cache=None, patch=FIXTURE_PATCH, **fields
+                )
+                for _ in range(repeat + 1)
+            ]
+
+    services = new_services()
+    results = {"api_call": timed(lambda: services.pop()._api_call(), repeat)}
+
+    services = new_services(stream=True)
+    results["api_call_streamed"] = timed(lambda: services.pop()._api_call(), repeat)
+
+    services = new_services(offline=True, response_data=payload)
+    results["sanitize"] = timed(lambda: services.pop()._sanitize_data(), repeat)
+
+    # The completion stage alone, each run gets a service with only the records parsed.
+    records = payload
+    for key in service_class.records_path:
+        records = records[key]
+    services = new_services(offline=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for service in services:
+            service._sanitize_records(records, **service_class.record_keys)
+    results["complete_missing"] = timed(
+        lambda: services.pop().complete_missing_champions_data(), repeat
+    )
+
+    sanitized = new_services(offline=True, response_data=payload)[0]
+    with contextlib.redirect_stdout(io.StringIO()):
+        sanitized._sanitize_data()
+    data = sanitized.columns
+
+    def build_dataframe():
+        df = project._stats_to_dataframe(data)
+        df.sort_values("Winrate", ascending=False, inplace=True)
+        df.set_index("ChampionId", inplace=True)
+
+    results["dataframe"] = timed(build_dataframe, repeat)
+    return results
+
+
+def bench_outputs(dataframe, export_types: list[str], repeat: int) -> dict:
+    from services.stream import Snapshot, create_app
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "data"))
+        os.makedirs(os.path.join(tmp, "plots"))
+        for export_type in export_types:
+            try:
+                results[f"export_{export_type}"] = timed(
+                    lambda: project.export_to(dataframe, "bench", export_type, tmp),
+                    repeat,
+                )
+            except ImportError as e:
+                print(f"Skipping {export_type}: {e}", file=sys.stderr)
+        # Charts are capped like --plot-top, a bar per row would exceed Agg's canvas limit at 100x.
+        results["plot_data"] = timed(
+            lambda: project.plot_data(dataframe, "bench", tmp, top=PLOT_TOP), repeat
+        )
+
+    results["stream_render"] = timed(lambda: Snapshot.from_dataframe(dataframe), repeat)
+    client = create_app(Snapshot.from_dataframe(dataframe)).test_client()
+    for route in ("/", "/json"):
+        results[f"stream_get{route}"] = timed(lambda: client.get(route), repeat)
+
+    return results
+
+
+def run(scales: list[int], repeat: int, export_types: list[str]) -> dict:
+    base_names, base_payloads = load_fixtures()
+    results = {}
+    for factor in scales:
+        names, payloads = scale(base_names, base_payloads, factor)
+        stages = {}
+        with champions_assets(names), stand_in_server(payloads):
+            for provider, payload in payloads.items():
+                for stage, timing in bench_provider(provider, payload, repeat).items():
+                    stages[f"{provider}/{stage}"] = timing
+            with contextlib.redirect_stdout(io.StringIO()):
+                dataframe = project.get_data_as_dataframe(
+                    "op.gg", cache=None, patch=FIXTURE_PATCH
+                )
+            for stage, timing in bench_outputs(dataframe, export_types, repeat).items():
+                stages[stage] = timing
+        results[f"{factor}x"] = stages
+
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(baseline_path: str, current_path: str, threshold: float) -> int:
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    with open(current_path) as f:
+        current = json.load(f)["results"]
+
+    regressions = 0
+    print(f"{'Stage':<40}{'Baseline':>12}{'Current':>12}{'Ratio':>8}")
+    for factor, stages in current.items():
+        for stage, timing in stages.items():
+            before = baseline.get(factor, {}).get(stage)
+            if before is None:
+                continue
+            ratio = timing["median"] / before["median"] if before["median"] else 1.0
+            flag = " !" if ratio > 1 + threshold else ""
+            regressions += bool(flag)
+            print(
+                f"{factor + ' ' + stage:<40}{before['median']:>12.4f}{timing['median']:>12.4f}{ratio:>8.2f}{flag}"
+            )
+
+    return 1 if regressions else 0
+
+
+def record() -> None:
+    # Saves the live provider responses and champion names as the new fixtures.
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for provider in PROVIDERS:
+        service = project.get_provider_class(provider)(cache=None)
+        with open(os.path.join(FIXTURES_DIR, f"{provider}.json"), "w") as f:
+            json.dump(service._api_call(), f)
+    with open(os.path.join(FIXTURES_DIR, "champions_names_by_id.json"), "w") as f:
+        json.dump(dict(service.champions_names), f)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time every pipeline stage offline, against recorded provider payloads"
+    )
+    parser.add_argument("-n", "--repeat", type=int, default=5)
+    parser.add_argument(
+        "--scales",
+        default="1,10,100",
+        help="Comma separated multipliers of the fixture rows, default: 1,10,100",
+    )
+    parser.add_argument(
+        "-t",
+        "--types",
+        default="csv,json,ndjson,txt,xlsx,parquet,feather",
+        help="Comma separated export types to time",
+    )
+    parser.add_argument(
+        "-o", "--output", help="Results file, default: benchmarks/results/<commit>.json"
+    )
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASELINE", "CURRENT"),
+        help="Compare two results files instead of running",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Slowdown ratio reported as a regression when comparing, default: 0.2",
+    )
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="Record the live provider responses as fixtures instead of running",
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        raise SystemExit(compare(*args.compare, args.threshold))
+    if args.record:
+        record()
+        return
+
+    revision = git_revision()
+    results = run(
+        [int(factor) for factor in args.scales.split(",")],
+        args.repeat,
+        args.types.split(","),
+    )
+
+    for factor, stages in results.items():
+        print(f"\n{factor}")
+        for stage, timing in stages.items():
+            print(f"  {stage:<36}{timing['median'] * 1000:>10.2f} ms")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{revision}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(
+            {
+                "revision": revision,
+                "python": sys.version.split()[0],
+                "repeat": args.repeat,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
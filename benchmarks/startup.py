@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Subsystem name -> modules the CLI imports when that code path is taken.
+SUBSYSTEMS: dict[str, tuple[str, ...]] = {
+    "cli": ("project",),
+    "fetch": ("services.opgg", "services.blitzgg"),
+    "dataframe": ("pandas",),
+    "export-xlsx": ("openpyxl", "UliPlot.XLSX"),
+    "plot": ("matplotlib.pyplot",),
+    "stream": ("flask",),
+}
+
+
+def measure_import(modules: tuple[str, ...]) -> float:
+    # -X importtime reports every import's cumulative cost in microseconds on stderr,
+    # the top level modules' entries cover everything they pulled in.
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line.split("|"))
+        if name in modules:
+            total += int(cumulative)
+
+    return total / 1_000_000
+
+
+def measure_command(args: list[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, check=False)
+    return time.perf_counter() - start
+
+
+def run(repeat: int) -> dict:
+    imports = {
+        name: statistics.median(measure_import(modules) for _ in range(repeat))
+        for name, modules in SUBSYSTEMS.items()
+    }
+    commands = {
+        " ".join(args): statistics.median(
+            measure_command(["project.py", *args]) for _ in range(repeat)
+        )
+        for args in (["--help"], ["--version"], ["invalid.gg", "-t", "csv"])
+    }
+
+    return {
+        "python": sys.version.split()[0],
+        "repeat": repeat,
+        "imports": imports,
+        "commands": commands,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the CLI startup time and the import cost of each subsystem"
+    )
+    parser.add_argument("-n", "--repeat", type=int, default=5)
+    parser.add_argument("-o", "--output", help="Write the results as json to a file")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+
+    print(f"{'Subsystem':<16}{'Import (s)':>12}")
+    for name, seconds in results["imports"].items():
+        print(f"{name:<16}{seconds:>12.3f}")
+    print(f"\n{'Command':<32}{'Wall (s)':>12}")
+    for command, seconds in results["commands"].items():
+        print(f"{command:<32}{seconds:>12.3f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
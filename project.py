@@ -1,18 +1,27 @@
+from __future__ import annotations
+
 import argparse
-import logging
+import importlib.util
 import os
 from datetime import datetime
+from typing import TYPE_CHECKING, Callable
 
-import flask.cli as flask_cli
-import pandas as pd
 from colorama import Fore, init
-from flask import Flask
-from matplotlib.pyplot import savefig
-from UliPlot.XLSX import auto_adjust_xlsx_column_width
 
 from services import __app_description__, __app_name__, __repo_url__, __version__
-from services.blitzgg import Blitz
-from services.opgg import OPGG
+from services.cache import DEFAULT_TTL, ResponseCache
+from services.exporters import WRITER_PACKAGES, WRITERS
+from services.profiling import stage
+
+# pandas, matplotlib, flask and the providers are imported inside the functions
+# that need them, so --help, argument errors and single exports stay cheap.
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from services.columns import ChampionColumns
+    from services.utils import BaseAPIService
+
+PROVIDERS: tuple[str, ...] = ("op.gg", "blitz.gg")
 
 
 def get_args(args=None) -> argparse.Namespace:
@@ -25,27 +34,143 @@ def get_args(args=None) -> argparse.Namespace:
 
     provider_arg = parser.add_argument(
         "provider",
-        help=f"{Fore.LIGHTBLUE_EX}Data provider to use, options: {{op.gg, blitz.gg}}{Fore.RESET}",
+        nargs="?",
+        help=f"{Fore.LIGHTBLUE_EX}Data provider to use, options: {{op.gg, blitz.gg, all}}{Fore.RESET}",
         type=str.lower,
-        # choices=["op.gg", "blitz.gg"], # removed due to uglifying the -h output
+        # choices=["op.gg", "blitz.gg", "all"], # removed due to uglifying the -h output
     )
     type_arg = parser.add_argument(
         "-t",
         "--type",
-        help=f"{Fore.LIGHTBLUE_EX}Data exporting type, options: {{xlsx, csv, json, txt}}{Fore.RESET}",
+        help=f"{Fore.LIGHTBLUE_EX}Data exporting type, comma separated for several, options: {{{', '.join(WRITERS)}}}{Fore.RESET}",
         type=str.lower,
         # choices=["xlsx", "csv", "json", "txt"], # removed due to uglifying the -h output
     )
+    parser.add_argument(
+        "--xlsx-stream",
+        action=argparse.BooleanOptionalAction,
+        help=f"{Fore.LIGHTBLUE_EX}Write xlsx rows incrementally in constant memory{Fore.RESET}",
+    )
+    sheet_by_arg = parser.add_argument(
+        "--sheet-by",
+        metavar="COLUMN",
+        help=f"{Fore.LIGHTBLUE_EX}Split the xlsx export into one sheet per value of a column, e.g. Provider or Role{Fore.RESET}",
+    )
+    parser.add_argument(
+        "--skip-unchanged",
+        action=argparse.BooleanOptionalAction,
+        help=f"{Fore.LIGHTBLUE_EX}Don't write an export again when the data is identical to its last export{Fore.RESET}",
+    )
+    parser.add_argument(
+        "--delta",
+        action=argparse.BooleanOptionalAction,
+        help=f"{Fore.LIGHTBLUE_EX}Only export the champions whose stats changed since the last export{Fore.RESET}",
+    )
     parser.add_argument(
         "--plot",
         action=argparse.BooleanOptionalAction,
         help=f"{Fore.LIGHTBLUE_EX}Visualize the data and export it as png{Fore.RESET}",
     )
+    parser.add_argument(
+        "--plot-format",
+        choices=("png", "svg"),
+        default="png",
+        help=f"{Fore.LIGHTBLUE_EX}Plot file format, default: png{Fore.RESET}",
+    )
+    plot_by_arg = parser.add_argument(
+        "--plot-by",
+        metavar="COLUMN",
+        help=f"{Fore.LIGHTBLUE_EX}Also plot one chart per value of a column, e.g. Role or Provider{Fore.RESET}",
+    )
+    plot_top_arg = parser.add_argument(
+        "--plot-top",
+        metavar="N",
+        type=int,
+        help=f"{Fore.LIGHTBLUE_EX}Only plot the N champions with the highest winrate{Fore.RESET}",
+    )
+    plot_dpi_arg = parser.add_argument(
+        "--plot-dpi",
+        metavar="DPI",
+        type=int,
+        default=100,
+        help=f"{Fore.LIGHTBLUE_EX}Plot resolution, lower values give smaller png files, default: 100{Fore.RESET}",
+    )
     parser.add_argument(
         "--stream",
         action=argparse.BooleanOptionalAction,
         help=f"{Fore.LIGHTBLUE_EX}Stream the data into html table and json response{Fore.RESET}",
     )
+    parser.add_argument(
+        "--archive",
+        action=argparse.BooleanOptionalAction,
+        help=f"{Fore.LIGHTBLUE_EX}Append the data to the historical archive, query it with: python -m services.archive{Fore.RESET}",
+    )
+    parser.add_argument(
+        "--patch",
+        help=f"{Fore.LIGHTBLUE_EX}Game patch of the champions assets and archive partition, e.g. 13.14.1{Fore.RESET}",
+    )
+    sweep_arg = parser.add_argument(
+        "--sweep",
+        metavar="DIMENSION=VALUES",
+        action="append",
+        help=f"{Fore.LIGHTBLUE_EX}Fetch every combination of comma separated values, repeatable, dimensions: {{tier, position, period, region, queue}}{Fore.RESET}",
+    )
+    workers_arg = parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help=f"{Fore.LIGHTBLUE_EX}Concurrent requests of a sweep, default: 4{Fore.RESET}",
+    )
+    rate_limit_arg = parser.add_argument(
+        "--rate-limit",
+        metavar="REQUESTS",
+        type=float,
+        default=2.0,
+        help=f"{Fore.LIGHTBLUE_EX}Requests per second allowed to each provider host during a sweep, default: 2{Fore.RESET}",
+    )
+    refresh_arg = parser.add_argument(
+        "--refresh",
+        metavar="SECONDS",
+        type=float,
+        help=f"{Fore.LIGHTBLUE_EX}Refetch the streamed data in the background every given seconds (±10%% jitter){Fore.RESET}",
+    )
+    parser.add_argument(
+        "--per-role",
+        action=argparse.BooleanOptionalAction,
+        help=f"{Fore.LIGHTBLUE_EX}Keep a row for every role a champion is played in, with its share of the champion's games{Fore.RESET}",
+    )
+    parser.add_argument(
+        "--stream-json",
+        action=argparse.BooleanOptionalAction,
+        help=f"{Fore.LIGHTBLUE_EX}Parse provider responses incrementally as they arrive, keeping only the needed columns{Fore.RESET}",
+    )
+    parser.add_argument(
+        "--offline",
+        action=argparse.BooleanOptionalAction,
+        help=f"{Fore.LIGHTBLUE_EX}Build the data only from cached provider responses{Fore.RESET}",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        metavar="SECONDS",
+        type=float,
+        default=DEFAULT_TTL,
+        help=f"{Fore.LIGHTBLUE_EX}Seconds to reuse a cached provider response before revalidating it, default: {DEFAULT_TTL:g}{Fore.RESET}",
+    )
+    batch_arg = parser.add_argument(
+        "--batch",
+        metavar="JOBFILE",
+        help=f"{Fore.LIGHTBLUE_EX}Run every job of a .toml/.yaml file in one process, fetching each provider once{Fore.RESET}",
+    )
+    parser.add_argument(
+        "--trace-out",
+        metavar="PATH",
+        help=f"{Fore.LIGHTBLUE_EX}Write the wall/CPU time, bytes and rows of every stage to a JSON trace{Fore.RESET}",
+    )
+    parser.add_argument(
+        "--profile",
+        action=argparse.BooleanOptionalAction,
+        help=f"{Fore.LIGHTBLUE_EX}Add the hot functions and peak allocations to the trace, default path: results/trace_<date>.json{Fore.RESET}",
+    )
     parser.add_argument(
         "-v",
         "--version",
@@ -59,12 +184,41 @@ def get_args(args=None) -> argparse.Namespace:
 
     args = parser.parse_args(args)
 
-    if args.provider not in ("op.gg", "blitz.gg"):
+    if args.batch:
+        from services.batch import BATCH_OPTIONS, load_jobs
+
+        for action in parser._actions:
+            if action.dest in BATCH_OPTIONS or not hasattr(args, action.dest):
+                continue
+            if getattr(args, action.dest) != action.default:
+                name = (
+                    action.option_strings[-1] if action.option_strings else "provider"
+                )
+                raise argparse.ArgumentError(
+                    batch_arg,
+                    f'"{name}" can not be used with --batch, set it in the jobs of the batch file',
+                )
+        try:
+            args.batch = load_jobs(
+                args.batch,
+                get_args,
+                {action.dest for action in parser._actions if action.dest != "help"},
+            )
+        except (OSError, ValueError) as e:
+            raise argparse.ArgumentError(batch_arg, str(e)) from e
+        return args
+
+    if args.provider is None:
+        raise argparse.ArgumentError(
+            provider_arg,
+            "Missing provider, options: {op.gg, blitz.gg, all}",
+        )
+    if args.provider not in (*PROVIDERS, "all"):
         raise argparse.ArgumentError(
             provider_arg,
-            f'Invalid provider: "{args.provider}", options: {{op.gg, blitz.gg}}',
+            f'Invalid provider: "{args.provider}", options: {{op.gg, blitz.gg, all}}',
         )
-    if not any((args.type, args.plot, args.stream)):
+    if not any((args.type, args.plot, args.stream, args.archive)):
         raise SystemExit(
             (
                 f"\N{information source} {Fore.LIGHTCYAN_EX}Please specify an export type, plot or stream flag."
@@ -72,87 +226,328 @@ def get_args(args=None) -> argparse.Namespace:
                 + f"\nor visit the repository: {__repo_url__}"
             )
         )
-    if args.type is not None and args.type not in ("xlsx", "csv", "json", "txt"):
-        raise argparse.ArgumentError(
-            type_arg,
-            f'Invalid type: "{args.type}", options: {{xlsx, csv, json, txt}}',
-        )
+    if args.type is not None:
+        for export_type in args.type.split(","):
+            if export_type not in WRITERS:
+                raise argparse.ArgumentError(
+                    type_arg,
+                    f'Invalid type: "{export_type}", options: {{{", ".join(WRITERS)}}}',
+                )
+            package = WRITER_PACKAGES.get(export_type)
+            if package and importlib.util.find_spec(package) is None:
+                raise argparse.ArgumentError(
+                    type_arg,
+                    f'The {export_type} export needs the {package} package: "pip3 install {package}"',
+                )
+
+    if args.sweep:
+        from services.sweep import parse_grid
+
+        try:
+            args.sweep = parse_grid(args.sweep)
+        except ValueError as e:
+            raise argparse.ArgumentError(sweep_arg, str(e)) from e
+        if args.per_role and "position" in args.sweep:
+            # Per-role data already has a row for every position.
+            raise argparse.ArgumentError(
+                sweep_arg,
+                "A position sweep can not be combined with --per-role, which fetches every position",
+            )
+        if args.archive:
+            # One snapshot per provider, the sweep cells would overwrite each other.
+            raise argparse.ArgumentError(
+                sweep_arg,
+                "Sweeps can not be archived, archive each cell as its own run",
+            )
+    for arg, name, value in (
+        (workers_arg, "workers", args.workers),
+        (rate_limit_arg, "rate limit", args.rate_limit),
+        (plot_dpi_arg, "plot DPI", args.plot_dpi),
+        (plot_top_arg, "plot top", args.plot_top),
+    ):
+        if value is not None and value <= 0:
+            raise argparse.ArgumentError(
+                arg, f'Invalid {name}: "{value}", must be positive'
+            )
+    if args.plot_by or args.sheet_by:
+        from services.columns import COLUMNS
+        from services.sweep import DIMENSIONS
+
+        # Checked up front, the exports would only fail after the data is fetched.
+        columns = [
+            *COLUMNS,
+            *(["RoleShare"] if args.per_role else []),
+            *(dimension.title() for dimension in DIMENSIONS if args.sweep),
+        ]
+        for arg, name, value in (
+            (plot_by_arg, "plot", args.plot_by),
+            (sheet_by_arg, "sheet", args.sheet_by),
+        ):
+            if value is not None and value not in columns:
+                raise argparse.ArgumentError(
+                    arg,
+                    f'Invalid {name} column: "{value}", options: {{{", ".join(columns)}}}',
+                )
+    if args.refresh is not None:
+        if args.refresh <= 0:
+            raise argparse.ArgumentError(
+                refresh_arg,
+                f'Invalid refresh interval: "{args.refresh}", must be positive',
+            )
+        if not args.stream:
+            raise argparse.ArgumentError(
+                refresh_arg,
+                "Refreshing only applies to the streamed data, add --stream",
+            )
+        if args.offline:
+            raise argparse.ArgumentError(
+                refresh_arg, "Offline data never changes, --refresh needs a network run"
+            )
 
     return args
 
 
-def get_data_as_dataframe(provider: str) -> pd.DataFrame:
+def get_provider_class(provider: str) -> type[BaseAPIService]:
     match provider:
         case "op.gg":
-            provider = OPGG()
+            from services.opgg import OPGG
+
+            return OPGG
         case "blitz.gg":
-            provider = Blitz()
+            from services.blitzgg import Blitz
+
+            return Blitz
         case _:
             raise ValueError(f"Invalid provider: {provider}")
 
-    data = provider.get_stats()
-    df = pd.DataFrame(data)
-    df.drop_duplicates(subset=["ChampionId"], keep="first", inplace=True)
-    df.sort_values("Winrate", ascending=False, inplace=True)
-    df.set_index("ChampionId", inplace=True)
+
+def _stats_to_dataframe(data: ChampionColumns, per_role: bool = False) -> pd.DataFrame:
+    # Wraps the typed columns without copying them, duplicates are dropped first.
+    return data.unique(per_role).to_dataframe()
+
+
+def _index_columns(*columns: str, per_role: bool = False) -> list[str]:
+    # Per-role data keeps a row per (ChampionId, Role).
+    return [columns[0], "Role", *columns[1:]] if per_role else list(columns)
+
+
+def get_data_as_dataframe(provider: str, **options) -> pd.DataFrame:
+    if provider == "all":
+        return get_combined_data_as_dataframe(PROVIDERS, **options)
+
+    data = get_provider_class(provider)(**options).get_stats()
+    return _provider_dataframe(data, provider, options.get("per_role", False))
+
+
+def _provider_dataframe(
+    data: ChampionColumns, provider: str, per_role: bool = False
+) -> pd.DataFrame:
+    with stage("dataframe", provider=provider) as record:
+        df = _stats_to_dataframe(data, per_role)
+        df.sort_values("Winrate", ascending=False, inplace=True)
+        df.set_index(_index_columns("ChampionId", per_role=per_role), inplace=True)
+        if per_role:
+            from services.roles import add_role_share
+
+            add_role_share(df)
+        record.rows = len(df)
 
     return df
 
 
+def get_combined_data_as_dataframe(
+    providers: tuple[str, ...], timeouts: dict[str, float] | None = None, **options
+) -> pd.DataFrame:
+    from concurrent.futures import ThreadPoolExecutor
+
+    from services.transport import create_session
+
+    classes = {provider: get_provider_class(provider) for provider in providers}
+    timeouts = timeouts or {}
+    per_role = options.get("per_role", False)
+    # One connection pool for every provider, sized so none of them waits on another,
+    # nor any of the requests a provider runs side by side (OP.GG's per-role positions).
+    fan_out = max(service_class.fan_out(per_role) for service_class in classes.values())
+    options.setdefault(
+        "session", create_session(pool_size=max(len(providers), fan_out))
+    )
+    options.setdefault("cache", ResponseCache())
+    # Instantiated up front so the champions assets are loaded once, not raced.
+    services = {
+        provider: service_class(timeout=timeouts.get(provider), **options)
+        for provider, service_class in classes.items()
+    }
+
+    stats = []
+    with ThreadPoolExecutor(max_workers=len(services)) as executor:
+        futures = {
+            provider: executor.submit(service.get_stats)
+            for provider, service in services.items()
+        }
+        for provider, future in futures.items():
+            try:
+                stats.append(future.result())
+            except Exception as e:
+                print(
+                    f"\N{warning sign} {Fore.LIGHTRED_EX}Skipping {provider}: {e}{Fore.RESET}"
+                )
+
+    if not stats:
+        raise ValueError(f"None of the providers returned data: {', '.join(providers)}")
+
+    return _combined_dataframe(stats, per_role)
+
+
+def _combined_dataframe(
+    stats: list[ChampionColumns], per_role: bool = False
+) -> pd.DataFrame:
+    with stage("dataframe", provider="all") as record:
+        # Joined as typed columns, so the categoricals stay categorical.
+        parts = [data.unique(per_role) for data in stats]
+        df = parts[0].concat(*parts[1:]).to_dataframe()
+        df.sort_values("Winrate", ascending=False, inplace=True)
+        df.set_index(
+            _index_columns("ChampionId", "Provider", per_role=per_role), inplace=True
+        )
+        if per_role:
+            from services.roles import add_role_share
+
+            add_role_share(df)
+        record.rows = len(df)
+
+    return df
+
+
+def get_sweep_data_as_dataframe(
+    provider: str, grid: dict[str, list[str]], **options
+) -> pd.DataFrame:
+    from services.sweep import sweep
+
+    providers = PROVIDERS if provider == "all" else (provider,)
+    return sweep(
+        {provider: get_provider_class(provider) for provider in providers},
+        grid,
+        **options,
+    )
+
+
 def export_to(
-    dataframe: pd.DataFrame, date_time: str, export_type: str, path: str
+    dataframe: pd.DataFrame, date_time: str, export_type: str, path: str, **options
 ) -> str:
-    file_path = f"{path}/data/results_{date_time}.{export_type}"
-    match export_type:
-        case "xlsx":
-            with pd.ExcelWriter(file_path) as writer:
-                dataframe.to_excel(writer)
-                auto_adjust_xlsx_column_width(
-                    dataframe, writer, sheet_name="Sheet1", margin=3
-                )
-        case "csv":
-            dataframe.to_csv(file_path)
-        case "json":
-            dataframe.to_json(file_path)
-        case "txt":
-            with open(file_path, "w") as f:
-                f.write(dataframe.to_string())
-        case _:
-            raise ValueError(f"Invalid type: {export_type}")
+    from services.exporters import export_file_path, write
 
-    return file_path
+    return write(
+        dataframe,
+        export_type,
+        export_file_path(path, date_time, export_type),
+        **options,
+    )
+
+
+def export_to_many(
+    dataframe: pd.DataFrame,
+    date_time: str,
+    export_types: list[str],
+    path: str,
+    options: dict[str, dict] | None = None,
+) -> dict[str, str]:
+    from services.exporters import write_many
+    from services.profiling import file_size
+
+    # One in-memory DataFrame fanned out to every writer concurrently.
+    with stage("export", types=export_types) as record:
+        paths = write_many(dataframe, export_types, path, date_time, options=options)
+        record.rows = len(dataframe)
+        record.bytes = file_size(*paths.values())
+
+    return paths
+
+
+def export_changed(
+    dataframe: pd.DataFrame,
+    date_time: str,
+    export_types: list[str],
+    path: str,
+    delta: bool = False,
+    options: dict[str, dict] | None = None,
+) -> tuple[dict[str, str], dict[str, str]]:
+    from services.exporters import write_changed
+    from services.profiling import file_size
+
+    with stage("export", types=export_types, delta=delta) as record:
+        paths, references = write_changed(
+            dataframe, export_types, path, date_time, delta=delta, options=options
+        )
+        record.rows = len(dataframe)
+        record.bytes = file_size(*paths.values())
+        record.attrs["unchanged"] = list(references)
 
+    return paths, references
 
-def plot_data(dataframe: pd.DataFrame, date_time: str, path: str) -> str:
-    plot_path = f"{path}/plots/plot_{date_time}.png"
 
-    dataframe.set_index("ChampionName", inplace=True)
-    dataframe["Winrate"].plot(kind="barh", figsize=(10, 75))
-    savefig(plot_path)
+def plot_data(
+    dataframe: pd.DataFrame,
+    date_time: str,
+    path: str,
+    plot_format: str = "png",
+    top: int | None = None,
+    dpi: int = 100,
+) -> str:
+    from services.plotting import plan, render
+
+    # Works on a copy of the two plotted columns, the caller's DataFrame is left as is.
+    (job,) = plan(
+        dataframe, f"{path}/plots/plot_{date_time}", plot_format, top=top, dpi=dpi
+    )
+    return render(job)
+
+
+def plot_data_many(
+    dataframe: pd.DataFrame,
+    date_time: str,
+    path: str,
+    plot_format: str = "png",
+    by: str | None = None,
+    top: int | None = None,
+    dpi: int = 100,
+) -> list[str]:
+    from services.plotting import plan, render_many
+    from services.profiling import file_size
+
+    with stage("plot", format=plot_format, by=by) as record:
+        jobs = plan(
+            dataframe, f"{path}/plots/plot_{date_time}", plot_format, by, top, dpi
+        )
+        paths = render_many(jobs)
+        record.rows = sum(len(job.data) for job in jobs)
+        record.bytes = file_size(*paths)
 
-    return plot_path
+    return paths
 
 
 def stream_data(
-    dataframe: pd.DataFrame, host: str = "localhost", port: int = 1010
+    dataframe: pd.DataFrame,
+    host: str = "localhost",
+    port: int = 1010,
+    refresh: float | None = None,
+    load: Callable[[], pd.DataFrame] | None = None,
+    jitter: float = 0.1,
 ) -> None:
-    app = Flask(__name__)
+    import logging
+
+    import flask.cli as flask_cli
+
+    from services.stream import Snapshot, SnapshotRefresher, SnapshotStore, create_app
+
+    # Rendered and compressed once, every request after that is a lookup.
+    store = SnapshotStore(Snapshot.from_dataframe(dataframe))
+    app = create_app(store)
+    if refresh and load is not None:
+        SnapshotRefresher(store, load, refresh, jitter).start()
     flask_cli.show_server_banner = lambda *args: None
     logger = logging.getLogger("werkzeug")
     logger.setLevel(logging.ERROR)
 
-    @app.route("/", methods=["GET"])
-    def render_table():
-        return dataframe.to_html(classes="data", header=True)
-
-    @app.route("/json", methods=["GET"])
-    def rend_json():
-        return app.response_class(
-            response=dataframe.to_json(),
-            status=200,
-            mimetype="application/json",
-        )
-
     domain = f"http://{host}:{port}"
     print(
         f"\N{satellite antenna} {Fore.LIGHTGREEN_EX}Data streaming server started, endpoints:"
@@ -167,11 +562,60 @@ def main():
     date_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
 
     args = get_args()
+    if not (args.trace_out or args.profile):
+        return run(args, date_time)
+
+    from services import profiling
+
+    trace_path = args.trace_out or f"results/trace_{date_time}.json"
+    tracer = profiling.enable()
+    profiler = profiling.Profiler() if args.profile else None
+    if profiler is not None:
+        profiler.start()
+    try:
+        run(args, date_time)
+    finally:
+        profile = None
+        if profiler is not None:
+            profile = profiler.stop(f"{os.path.splitext(trace_path)[0]}.prof")
+        profiling.write_trace(trace_path, tracer, profile)
+        profiling.disable()
+        print(f"\N{stopwatch} {Fore.LIGHTGREEN_EX}Trace written to: ./{trace_path}")
+
+
+def run(args: argparse.Namespace, date_time: str) -> None:
+    if args.batch:
+        return run_batch(args, date_time)
+
+    def load_data(cache_ttl: float = args.cache_ttl) -> pd.DataFrame:
+        options = {
+            "cache": ResponseCache(ttl=cache_ttl),
+            "offline": bool(args.offline),
+            "stream": bool(args.stream_json),
+            "per_role": bool(args.per_role),
+            "patch": args.patch,
+        }
+        if args.sweep:
+            return get_sweep_data_as_dataframe(
+                args.provider,
+                args.sweep,
+                max_workers=args.workers,
+                rate=args.rate_limit,
+                **options,
+            )
+        return get_data_as_dataframe(args.provider, **options)
 
-    data = get_data_as_dataframe(args.provider)
+    data = load_data()
+    write_outputs(data, args, f"results/{args.provider}", date_time)
+
+    if args.stream:
+        # Refreshes always revalidate, a cached response would serve the old data again.
+        stream_data(data, refresh=args.refresh, load=lambda: load_data(cache_ttl=0))
 
-    path = f"results/{args.provider}"
 
+def write_outputs(
+    data: pd.DataFrame, args: argparse.Namespace, path: str, date_time: str
+) -> None:
     for arg, wanted_path in (
         (args.type, f"{path}/data"),
         (args.plot, f"{path}/plots"),
@@ -180,19 +624,149 @@ def main():
             os.makedirs(wanted_path)
 
     if args.type:
-        export_path = export_to(data, date_time, args.type, path)
+        export_types = args.type.split(",")
+        export_options = {
+            "xlsx": {"streaming": bool(args.xlsx_stream), "sheet_by": args.sheet_by}
+        }
+        if args.skip_unchanged or args.delta:
+            export_paths, references = export_changed(
+                data,
+                date_time,
+                export_types,
+                path,
+                delta=bool(args.delta),
+                options=export_options,
+            )
+            for export_type, reference in references.items():
+                print(
+                    f"\N{black universal recycling symbol} {Fore.LIGHTYELLOW_EX}Unchanged data, the {export_type.upper()} export is still: ./{reference}"
+                )
+            if args.delta and not export_paths:
+                print(
+                    f"\N{black universal recycling symbol} {Fore.LIGHTYELLOW_EX}No champion changed since the last export."
+                )
+        else:
+            export_paths = export_to_many(
+                data, date_time, export_types, path, options=export_options
+            )
+        for export_type, export_path in export_paths.items():
+            print(
+                f"\N{bar chart} {Fore.LIGHTGREEN_EX}Exported successfully as {export_type.upper()} to: ./{export_path}"
+            )
+
+    if args.archive:
+        from services.archive import DEFAULT_ARCHIVE_PATH, Archive
+
+        with stage("archive") as record, Archive(DEFAULT_ARCHIVE_PATH) as archive:
+            snapshot_ids = archive.append(data, patch=args.patch)
+            record.rows = len(data)
         print(
-            f"\N{bar chart} {Fore.LIGHTGREEN_EX}Exported successfully as {args.type.upper()} to: ./{export_path}"
+            f"\N{card file box} {Fore.LIGHTGREEN_EX}Archived {len(snapshot_ids)} new snapshot(s) to: ./{DEFAULT_ARCHIVE_PATH}"
         )
 
     if args.plot:
-        plot_path = plot_data(data, date_time, path)
-        print(
-            f"\N{artist palette} {Fore.LIGHTGREEN_EX}Plotted successfully as PNG to: ./{plot_path}"
+        plot_paths = plot_data_many(
+            data,
+            date_time,
+            path,
+            args.plot_format,
+            by=args.plot_by,
+            top=args.plot_top,
+            dpi=args.plot_dpi,
         )
+        for plot_path in plot_paths:
+            print(
+                f"\N{artist palette} {Fore.LIGHTGREEN_EX}Plotted successfully as {args.plot_format.upper()} to: ./{plot_path}"
+            )
 
-    if args.stream:
-        stream_data(data)
+
+def run_batch(args: argparse.Namespace, date_time: str) -> None:
+    from concurrent.futures import ThreadPoolExecutor
+
+    from services.ratelimit import HostRateLimiter
+    from services.sweep import cell_frame, combine
+    from services.transport import create_session
+
+    classes = {provider: get_provider_class(provider) for provider in PROVIDERS}
+    sources = {job.name: job.source(classes) for job in args.batch}
+    # The dependency graph: every job needs a source, every source needs fetches.
+    fetches = list(
+        dict.fromkeys(fetch for _, needed in sources.values() for fetch in needed)
+    )
+    print(
+        f"\N{spiral calendar pad} {Fore.LIGHTCYAN_EX}Running {len(args.batch)} jobs over {len(fetches)} provider calls..."
+    )
+
+    # Every worker may be running a call that fans out to several requests.
+    fan_out = max(classes[fetch.provider].fan_out(fetch.per_role) for fetch in fetches)
+    session = create_session(
+        pool_size=args.workers * fan_out, rate_limiter=HostRateLimiter(args.rate_limit)
+    )
+    caches: dict[float, ResponseCache] = {}
+    # Instantiated up front so the champions assets are loaded once, not raced.
+    services = {
+        fetch: classes[fetch.provider](
+            **dict(fetch.params),
+            session=session,
+            cache=caches.setdefault(
+                fetch.cache_ttl, ResponseCache(ttl=fetch.cache_ttl)
+            ),
+            offline=fetch.offline,
+            stream=fetch.stream,
+            per_role=fetch.per_role,
+            patch=fetch.patch,
+        )
+        for fetch in fetches
+    }
+
+    stats = {}
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            fetch: executor.submit(service.get_stats)
+            for fetch, service in services.items()
+        }
+        for fetch, future in futures.items():
+            try:
+                stats[fetch] = future.result()
+            except Exception as e:
+                print(
+                    f"\N{warning sign} {Fore.LIGHTRED_EX}Skipping {fetch.provider} {dict(fetch.params)}: {e}{Fore.RESET}"
+                )
+
+    frames: dict[tuple, pd.DataFrame] = {}
+    for job in args.batch:
+        source = sources[job.name]
+        kind, needed = source
+        fetched = [fetch for fetch in needed if fetch in stats]
+        if not fetched:
+            print(
+                f"\N{warning sign} {Fore.LIGHTRED_EX}Skipping job {job.name}: none of its providers returned data{Fore.RESET}"
+            )
+            continue
+
+        # Built once per source, every job reading it shares the DataFrame.
+        if source not in frames:
+            per_role = bool(job.args.per_role)
+            if kind == "sweep":
+                frames[source] = combine(
+                    [
+                        cell_frame(
+                            stats[fetch], services[fetch].get_dimensions(), per_role
+                        )
+                        for fetch in fetched
+                    ],
+                    per_role,
+                )
+            elif kind == "all":
+                frames[source] = _combined_dataframe(
+                    [stats[fetch] for fetch in fetched],
+                    per_role,
+                )
+            else:
+                frames[source] = _provider_dataframe(stats[fetched[0]], kind, per_role)
+
+        print(f"\N{gear} {Fore.LIGHTCYAN_EX}Job {job.name}:")
+        write_outputs(frames[source], job.args, job.path, date_time)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Columns that describe a provider's row rather than the snapshot it belongs to.
+ROW_COLUMNS = (
+    "ChampionId",
+    "ChampionName",
+    "Role",
+    "TotalGames",
+    "Wins",
+    "Losses",
+    "Winrate",
+    "Provider",
+    "RoleShare",
+    "CapturedAt",
+    "SnapshotId",
+)
+# z of a two-sided 95% interval.
+Z_95 = 1.959964
+# Weight of the pooled winrate prior, in games.
+PRIOR_GAMES = 200
+# Every match has ten picks.
+PICKS_PER_MATCH = 10
+
+
+def wilson_interval(
+    wins: np.ndarray, games: np.ndarray, z: float = Z_95
+) -> tuple[np.ndarray, np.ndarray]:
+    wins = np.asarray(wins, dtype=np.float64)
+    games = np.asarray(games, dtype=np.float64)
+    played = games > 0
+    n = np.where(played, games, 1.0)
+    p = wins / n
+
+    denominator = 1 + z**2 / n
+    center = (p + z**2 / (2 * n)) / denominator
+    half = z * np.sqrt(p * (1 - p) / n + z**2 / (4 * n**2)) / denominator
+
+    # Without games the interval spans everything.
+    return (
+        np.round(np.where(played, center - half, 0.0) * 100, 2),
+        np.round(np.where(played, center + half, 1.0) * 100, 2),
+    )
+
+
+def bayesian_winrate(
+    wins: np.ndarray,
+    games: np.ndarray,
+    prior: np.ndarray | float,
+    prior_games: float = PRIOR_GAMES,
+    z: float = Z_95,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Beta posterior around `prior` (a rate), the interval is its normal approximation.
+    alpha = np.asarray(wins, dtype=np.float64) + prior * prior_games
+    beta = np.asarray(games, dtype=np.float64) - wins + (1 - prior) * prior_games
+    total = alpha + beta
+    mean = alpha / total
+    half = z * np.sqrt(alpha * beta / (total**2 * (total + 1)))
+
+    return (
+        np.round(mean * 100, 2),
+        np.round(np.clip(mean - half, 0, 1) * 100, 2),
+        np.round(np.clip(mean + half, 0, 1) * 100, 2),
+    )
+
+
+def shared_dimensions(frame: pd.DataFrame, columns: list[str]) -> list[str]:
+    # Sweep cells hold "-" for the dimensions a provider doesn't support. Only the
+    # ones every provider fills can join them, the others are dropped unless they
+    # split a provider's rows, which no join could reconcile.
+    shared = []
+    providers = frame["Provider"].astype(str)
+    for column in columns:
+        values = frame[column].astype(str)
+        if values.ne("-").groupby(providers).any().all():
+            shared.append(column)
+        elif values.groupby(providers).nunique().gt(1).any():
+            raise ValueError(
+                f'Only some providers have a "{column}", and it splits their rows, '
+                "pass the dimensions to join on as `by`"
+            )
+
+    return shared
+
+
+def consensus(
+    dataframe: pd.DataFrame,
+    by: list[str] | None = None,
+    per_role: bool | None = None,
+    z: float = Z_95,
+    prior_games: float = PRIOR_GAMES,
+) -> pd.DataFrame:
+    # One row per champion (and role) and snapshot group, reconciling every provider.
+    # `dataframe` is any long frame with a row per provider: a run, a sweep or an
+    # archive query, which is grouped by its Patch and Date columns.
+    frame = dataframe.reset_index()
+    if "index" in frame.columns and "index" not in dataframe.columns:
+        frame.drop(columns="index", inplace=True)
+    dimensions = [column for column in frame.columns if column not in ROW_COLUMNS]
+    if per_role is None:
+        # Several rows of a champion in one provider snapshot can only be its roles.
+        snapshot = [*dimensions, "Provider", "ChampionId"]
+        if "SnapshotId" in frame.columns:
+            snapshot.append("SnapshotId")
+        per_role = "Role" in dataframe.index.names or (
+            "Role" in frame.columns and frame.duplicated(snapshot).any()
+        )
+    by = shared_dimensions(frame, dimensions) if by is None else list(by)
+    champion = ["ChampionId", *(["Role"] if per_role else [])]
+    keys = [*by, *champion]
+
+    frame["Provider"] = frame["Provider"].astype(str)
+    if per_role:
+        frame["Role"] = frame["Role"].astype(str)
+    # Archives can hold several captures of a provider per day, the last one counts.
+    if "CapturedAt" in frame.columns:
+        frame.sort_values("CapturedAt", kind="stable", inplace=True)
+    frame.drop_duplicates([*keys, "Provider"], keep="last", inplace=True)
+
+    frame["Matches"] = (
+        frame.groupby([*by, "Provider"], sort=False)["TotalGames"].transform("sum")
+        / PICKS_PER_MATCH
+    )
+    # Providers without games for a champion don't weigh in on its winrate spread.
+    frame["PlayedWinrate"] = frame["Winrate"].where(frame["TotalGames"] > 0)
+
+    grouped = frame.groupby(keys, sort=False, observed=True)
+    result = grouped.agg(
+        ChampionName=("ChampionName", "first"),
+        # Deduplicated above, so a group holds one row per provider.
+        Providers=("Provider", "size"),
+        TotalGames=("TotalGames", "sum"),
+        Wins=("Wins", "sum"),
+        Matches=("Matches", "sum"),
+        WinrateMin=("PlayedWinrate", "min"),
+        WinrateMax=("PlayedWinrate", "max"),
+    )
+    result["ChampionName"] = result["ChampionName"].astype(str)
+
+    games = result["TotalGames"].to_numpy(dtype=np.float64)
+    wins = result["Wins"].to_numpy(dtype=np.float64)
+    result["Losses"] = result["TotalGames"] - result["Wins"]
+    result["Winrate"] = np.round(
+        np.divide(wins, games, out=np.zeros(len(games)), where=games > 0) * 100, 2
+    )
+    result["WilsonLower"], result["WilsonUpper"] = wilson_interval(wins, games, z)
+
+    # The prior of each group is its pooled winrate, so shrinkage follows the snapshot.
+    if by:
+        totals = result.groupby(level=by, sort=False)[["Wins", "TotalGames"]].transform(
+            "sum"
+        )
+        pooled_wins = totals["Wins"].to_numpy(dtype=np.float64)
+        pooled_games = totals["TotalGames"].to_numpy(dtype=np.float64)
+    else:
+        pooled_wins, pooled_games = wins.sum(), games.sum()
+    prior = np.divide(
+        pooled_wins,
+        pooled_games,
+        out=np.full(np.shape(pooled_games), 0.5),
+        where=pooled_games > 0,
+    )
+    (
+        result["BayesWinrate"],
+        result["BayesLower"],
+        result["BayesUpper"],
+    ) = bayesian_winrate(wins, games, prior, prior_games, z)
+
+    matches = result["Matches"].to_numpy(dtype=np.float64)
+    result["PickRate"] = np.round(
+        np.divide(games, matches, out=np.zeros(len(games)), where=matches > 0) * 100,
+        2,
+    )
+    result["WinrateSpread"] = (result["WinrateMax"] - result["WinrateMin"]).round(2)
+    result.drop(columns=["Matches", "WinrateMin", "WinrateMax"], inplace=True)
+
+    # Each provider's own figures, side by side.
+    providers = frame.set_index([*keys, "Provider"])[["TotalGames", "Winrate"]].unstack(
+        "Provider"
+    )
+    providers.columns = [f"{value} {provider}" for value, provider in providers.columns]
+    result = result.join(providers)
+
+    return result.sort_values(
+        [*by, "Winrate"], ascending=[True] * len(by) + [False], kind="stable"
+    )
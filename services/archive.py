@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from colorama import Fore, init
+
+from .assets import current_patch
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEFAULT_ARCHIVE_PATH = "results/archive.sqlite3"
+
+STAT_COLUMNS = (
+    "ChampionId",
+    "ChampionName",
+    "Role",
+    "TotalGames",
+    "Wins",
+    "Losses",
+    "Winrate",
+)
+
+# The stats table is clustered on (Provider, Patch, Date) so every range query
+# only reads its own partitions, champion lookups go through their own index.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    SnapshotId INTEGER PRIMARY KEY,
+    Provider TEXT NOT NULL,
+    Patch TEXT NOT NULL,
+    Date TEXT NOT NULL,
+    CapturedAt TEXT NOT NULL,
+    ContentHash TEXT NOT NULL,
+    Rows INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_partition
+    ON snapshots (Provider, Patch, CapturedAt);
+CREATE TABLE IF NOT EXISTS champion_stats (
+    Provider TEXT NOT NULL,
+    Patch TEXT NOT NULL,
+    Date TEXT NOT NULL,
+    SnapshotId INTEGER NOT NULL REFERENCES snapshots (SnapshotId),
+    ChampionId INTEGER NOT NULL,
+    ChampionName TEXT NOT NULL,
+    Role TEXT NOT NULL,
+    TotalGames INTEGER NOT NULL,
+    Wins INTEGER NOT NULL,
+    Losses INTEGER NOT NULL,
+    Winrate REAL NOT NULL,
+    PRIMARY KEY (Provider, Patch, Date, SnapshotId, ChampionId, Role)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS champion_stats_champion
+    ON champion_stats (ChampionId, Date);
+CREATE INDEX IF NOT EXISTS champion_stats_name
+    ON champion_stats (ChampionName COLLATE NOCASE, Date);
+"""
+
+
+def content_hash(frame: pd.DataFrame) -> str:
+    canonical = frame.loc[:, STAT_COLUMNS].sort_values(["ChampionId", "Role"])
+    return hashlib.sha256(canonical.to_csv(index=False).encode()).hexdigest()
+
+
+@dataclass(slots=True)
+class Archive:
+    path: str = DEFAULT_ARCHIVE_PATH
+    connection: sqlite3.Connection = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> Archive:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def append(
+        self,
+        dataframe: pd.DataFrame,
+        patch: str | None = None,
+        captured_at: datetime | None = None,
+    ) -> list[int]:
+        captured_at = captured_at or datetime.now()
+        # Unpinned runs use the assets' patch, "unknown" only before the first sync.
+        patch = patch or current_patch() or "unknown"
+        frame = dataframe.reset_index()
+
+        snapshot_ids = []
+        with self.connection:
+            for provider, rows in frame.groupby("Provider", sort=False, observed=True):
+                digest = content_hash(rows)
+                if digest == self._latest_hash(provider, patch):
+                    continue
+
+                cursor = self.connection.execute(
+                    "INSERT INTO snapshots (Provider, Patch, Date, CapturedAt, ContentHash, Rows)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        provider,
+                        patch,
+                        captured_at.date().isoformat(),
+                        captured_at.isoformat(timespec="seconds"),
+                        digest,
+                        len(rows),
+                    ),
+                )
+                snapshot_id = cursor.lastrowid
+                self.connection.executemany(
+                    "INSERT INTO champion_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        (provider, patch, captured_at.date().isoformat(), snapshot_id)
+                        + values
+                        for values in rows.loc[:, STAT_COLUMNS].itertuples(
+                            index=False, name=None
+                        )
+                    ),
+                )
+                snapshot_ids.append(snapshot_id)
+
+        return snapshot_ids
+
+    def _latest_hash(self, provider: str, patch: str) -> str | None:
+        row = self.connection.execute(
+            "SELECT ContentHash FROM snapshots WHERE Provider = ? AND Patch = ?"
+            " ORDER BY CapturedAt DESC, SnapshotId DESC LIMIT 1",
+            (provider, patch),
+        ).fetchone()
+        return row[0] if row else None
+
+    def snapshots(self, provider: str | None = None) -> pd.DataFrame:
+        import pandas as pd
+
+        sql = "SELECT * FROM snapshots"
+        params: list = []
+        if provider:
+            sql += " WHERE Provider = ?"
+            params.append(provider)
+
+        return pd.read_sql_query(
+            sql + " ORDER BY CapturedAt", self.connection, params=params
+        )
+
+    def query(
+        self,
+        champion: int | str | None = None,
+        provider: str | None = None,
+        patch: str | None = None,
+        start: str | None = None,
+        end: str | None = None,
+        role: str | None = None,
+    ) -> pd.DataFrame:
+        import pandas as pd
+
+        # Every filter becomes a WHERE clause so SQLite can use the partition and
+        # champion indexes instead of loading whole snapshots.
+        conditions = []
+        params: list = []
+        for column, value in (
+            ("Provider", provider),
+            ("Patch", patch),
+            ("Role", role),
+        ):
+            if value is not None:
+                conditions.append(f"s.{column} = ?")
+                params.append(value)
+        if champion is not None:
+            if isinstance(champion, int) or str(champion).isdigit():
+                conditions.append("s.ChampionId = ?")
+                params.append(int(champion))
+            else:
+                conditions.append("s.ChampionName = ? COLLATE NOCASE")
+                params.append(champion)
+        if start is not None:
+            conditions.append("s.Date >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("s.Date <= ?")
+            params.append(end)
+
+        sql = (
+            "SELECT snap.CapturedAt, s.* FROM champion_stats AS s"
+            " JOIN snapshots AS snap USING (SnapshotId)"
+        )
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY snap.CapturedAt, s.Provider, s.ChampionId"
+
+        return pd.read_sql_query(sql, self.connection, params=params)
+
+
+def get_args(args=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m services.archive",
+        description=f"{Fore.LIGHTCYAN_EX}Query the archived champions stats{Fore.RESET}",
+    )
+    parser.add_argument("--path", default=DEFAULT_ARCHIVE_PATH)
+    parser.add_argument("-c", "--champion", help="Champion ID or name")
+    parser.add_argument("-p", "--provider", type=str.upper, help="e.g. OP.GG")
+    parser.add_argument("--patch")
+    parser.add_argument("--role")
+    parser.add_argument("--from", dest="start", help="First date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", help="Last date, YYYY-MM-DD")
+    parser.add_argument(
+        "--snapshots",
+        action="store_true",
+        help="List the archived snapshots instead of their stats",
+    )
+    parser.add_argument(
+        "--consensus",
+        action="store_true",
+        help="Reconcile the providers into one row per champion, patch and date",
+    )
+
+    return parser.parse_args(args)
+
+
+def main():
+    init(autoreset=True)
+    args = get_args()
+
+    with Archive(args.path) as archive:
+        if args.snapshots:
+            result = archive.snapshots(args.provider)
+        else:
+            result = archive.query(
+                champion=args.champion,
+                provider=args.provider,
+                patch=args.patch,
+                start=args.start,
+                end=args.end,
+                role=args.role,
+            )
+            if args.consensus:
+                from .analysis import consensus
+
+                result = consensus(result).reset_index()
+
+    print(result.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+
+import requests
+from colorama import Fore, init
+
+from . import registry
+from .cache import write_atomic
+from .transport import create_session
+
+VERSIONS_URL = "https://utils.iesdev.com/static/json/lol/riot/versions"
+CHAMPIONS_URL = (
+    "https://ddragon.leagueoflegends.com/cdn/{patch}/data/en_US/champion.json"
+)
+# Seconds the latest patch is trusted before the versions list is revalidated.
+VERSIONS_TTL = 3600.0
+
+
+def patch_dir(patch: str) -> str:
+    return f"{registry.ASSETS_DIR}/patches/{patch}"
+
+
+def manifest_path(patch: str | None = None) -> str:
+    if patch is None:
+        return f"{registry.ASSETS_DIR}/manifest.json"
+    return f"{patch_dir(patch)}/manifest.json"
+
+
+@dataclass(slots=True)
+class AssetManifest:
+    patch: str
+    etag: str | None = None
+    last_modified: str | None = None
+    # Of the champion.json body the artifacts were built from.
+    sha256: str | None = None
+    champions: int = 0
+    synced_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def load(cls, path: str) -> AssetManifest | None:
+        try:
+            with open(path) as f:
+                return cls(**json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError, TypeError):
+            return None
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, json.dumps(asdict(self)).encode())
+
+
+@dataclass(slots=True)
+class VersionsManifest:
+    latest: str
+    etag: str | None = None
+    last_modified: str | None = None
+    checked_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def load(cls) -> VersionsManifest | None:
+        try:
+            with open(manifest_path()) as f:
+                return cls(**json.load(f)["versions"])
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+            return None
+
+    def save(self, current: str | None) -> None:
+        os.makedirs(registry.ASSETS_DIR, exist_ok=True)
+        write_atomic(
+            manifest_path(),
+            json.dumps({"versions": asdict(self), "current": current}).encode(),
+        )
+
+
+# When the versions list last failed to load in this process, for the runs that
+# have no versions manifest to record the failed check in.
+_versions_failed_at: float | None = None
+
+
+def versions_due(ttl: float = VERSIONS_TTL) -> bool:
+    # Whether the latest patch is worth asking for, failed checks count as checks.
+    versions = VersionsManifest.load()
+    checks = [versions.checked_at] if versions is not None else []
+    if _versions_failed_at is not None:
+        checks.append(_versions_failed_at)
+    return not checks or time.time() - max(checks) >= ttl
+
+
+def _conditional_headers(
+    headers: dict[str, str], etag: str | None, last_modified: str | None
+) -> dict[str, str]:
+    headers = dict(headers)
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+def latest_patch(
+    session: requests.Session,
+    headers: dict[str, str] | None = None,
+    timeout: float | None = None,
+    ttl: float = VERSIONS_TTL,
+) -> str:
+    global _versions_failed_at
+
+    versions = VersionsManifest.load()
+    if versions is not None and time.time() - versions.checked_at < ttl:
+        return versions.latest
+    if not versions_due(ttl):
+        raise requests.ConnectionError(
+            "The patches list couldn't be fetched recently, try again later or pin a --patch"
+        )
+
+    print(
+        f"{Fore.LIGHTYELLOW_EX}\t\t\N{telephone receiver} Calling for the latest patch..."
+    )
+    try:
+        response = session.get(
+            VERSIONS_URL,
+            headers=_conditional_headers(
+                headers or {},
+                versions and versions.etag,
+                versions and versions.last_modified,
+            ),
+            timeout=timeout,
+        )
+        if not response and not (versions is not None and response.status_code == 304):
+            raise requests.HTTPError(
+                f"Couldn't fetch the patches list: {response.status_code} {response.reason}"
+            )
+    except requests.RequestException:
+        # Recorded like a successful check, so the host isn't asked again before
+        # the TTL is up, the last known patch keeps being used meanwhile.
+        _versions_failed_at = time.time()
+        if versions is not None:
+            versions.checked_at = _versions_failed_at
+            versions.save(current_patch())
+        raise
+
+    if versions is not None and response.status_code == 304:
+        versions.checked_at = time.time()
+    else:
+        versions = VersionsManifest(
+            latest=response.json()[0],
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+
+    versions.save(current_patch())
+    return versions.latest
+
+
+def current_patch() -> str | None:
+    # The patch the top level assets were last published from.
+    try:
+        with open(manifest_path()) as f:
+            return json.load(f).get("current")
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _artifacts_exist(patch: str) -> bool:
+    return os.path.exists(registry.names_path(patch))
+
+
+def _build_artifacts(patch: str, body: bytes) -> int:
+    champions = json.loads(body)
+    assert (
+        "data" in champions
+    ), "Couldn't fetch the champions data from Data Dragon, make sure that the provided patch is valid."
+
+    # The compact ID -> name map is all the providers read, champion.json is kept
+    # for reference and never parsed on the hot path.
+    names_by_id = {value["key"]: value["name"] for value in champions["data"].values()}
+    assert len(champions["data"]) == len(names_by_id), f"{Fore.RED}Keys are not equal"
+
+    os.makedirs(patch_dir(patch), exist_ok=True)
+    write_atomic(f"{patch_dir(patch)}/champion.json", body)
+    write_atomic(registry.names_path(patch), json.dumps(names_by_id).encode())
+    return len(names_by_id)
+
+
+def _publish(patch: str) -> None:
+    # The top level files follow the latest synced patch, for runs without --patch.
+    with open(registry.names_path(patch), "rb") as f:
+        names = f.read()
+    with open(f"{patch_dir(patch)}/champion.json", "rb") as f:
+        champions = f.read()
+    write_atomic(registry.names_path(), names)
+    write_atomic(f"{registry.ASSETS_DIR}/champions.json", champions)
+
+    # A missing versions entry is stale on purpose, the next sync revalidates it.
+    versions = VersionsManifest.load() or VersionsManifest(latest=patch, checked_at=0)
+    versions.save(patch)
+
+
+def sync(
+    patch: str | None = None,
+    session: requests.Session | None = None,
+    headers: dict[str, str] | None = None,
+    timeout: float | None = None,
+    force: bool = False,
+) -> AssetManifest:
+    session = session or create_session()
+    headers = headers or {}
+    pinned = patch is not None
+    if not pinned:
+        print(f"{Fore.LIGHTBLUE_EX}\t\N{information source} No patch specified.")
+        # Forcing also asks for the latest patch again, a new one may have come out.
+        patch = latest_patch(
+            session, headers, timeout, ttl=0 if force else VERSIONS_TTL
+        )
+    print(f"{Fore.LIGHTGREEN_EX}\t\t\t\N{check mark} Using patch {patch}")
+
+    manifest = AssetManifest.load(manifest_path(patch))
+    # A patch's data never changes upstream, synced artifacts are reused as they are.
+    if manifest is not None and _artifacts_exist(patch) and not force:
+        print(
+            f"{Fore.LIGHTGREEN_EX}\t\N{check mark} Champions assets of patch {patch} are up to date."
+        )
+    else:
+        champion_path = f"{patch_dir(patch)}/champion.json"
+        local = manifest is not None and os.path.exists(champion_path)
+        response = session.get(
+            CHAMPIONS_URL.format(patch=patch),
+            headers=_conditional_headers({}, manifest.etag, manifest.last_modified)
+            if local
+            else None,
+            timeout=timeout,
+        )
+        if local and response.status_code == 304:
+            with open(champion_path, "rb") as f:
+                body = f.read()
+            etag, last_modified = manifest.etag, manifest.last_modified
+        elif not response:
+            raise requests.HTTPError(
+                "Couldn't fetch the champions data from Data Dragon, make sure that the provided patch is valid."
+            )
+        else:
+            body = response.content
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+        print(
+            f"{Fore.LIGHTYELLOW_EX}\t\N{hourglass} Writing the champions assets of patch {patch}"
+        )
+        champions = _build_artifacts(patch, body)
+        manifest = AssetManifest(
+            patch=patch,
+            etag=etag,
+            last_modified=last_modified,
+            sha256=hashlib.sha256(body).hexdigest(),
+            champions=champions,
+        )
+        # Written last, a manifest only exists for complete artifacts.
+        manifest.save(manifest_path(patch))
+
+    if not pinned and (
+        current_patch() != patch or not os.path.exists(registry.names_path())
+    ):
+        _publish(patch)
+
+    return manifest
+
+
+def get_args(args=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m services.assets",
+        description=f"{Fore.LIGHTCYAN_EX}Sync the champions assets from Data Dragon{Fore.RESET}",
+    )
+    parser.add_argument("--patch", help="Pin a patch instead of the latest one")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Revalidate the patch's champion.json even if it was synced already",
+    )
+
+    return parser.parse_args(args)
+
+
+def main():
+    init(autoreset=True)
+    args = get_args()
+    manifest = sync(args.patch, force=args.force)
+    print(
+        f"\N{package} {Fore.LIGHTGREEN_EX}{manifest.champions} champions of patch {manifest.patch} in: ./{patch_dir(manifest.patch)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import argparse
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Collection
+
+from .cache import DEFAULT_TTL
+
+if TYPE_CHECKING:
+    from .utils import BaseAPIService
+
+# Options of a single interactive run, a batch only writes files.
+RUN_OPTIONS = ("stream", "refresh", "trace_out", "profile", "batch", "version")
+# Options of the batch process itself, every other one is set per job.
+BATCH_OPTIONS = ("batch", "workers", "rate_limit", "trace_out", "profile")
+# A job has to write something, through at least one of these.
+OUTPUT_OPTIONS = ("type", "plot", "archive")
+
+
+@dataclass(frozen=True, slots=True)
+class Fetch:
+    # Everything that changes a provider's response, jobs sharing it share the call.
+    provider: str
+    params: tuple[tuple[str, str], ...] = ()
+    per_role: bool = False
+    patch: str | None = None
+    offline: bool = False
+    stream: bool = False
+    cache_ttl: float = DEFAULT_TTL
+
+
+@dataclass(slots=True)
+class Job:
+    name: str
+    args: argparse.Namespace
+    path: str
+
+    def fetches(
+        self, service_classes: dict[str, type[BaseAPIService]]
+    ) -> tuple[Fetch, ...]:
+        from .sweep import expand_grid
+
+        providers = (
+            tuple(service_classes)
+            if self.args.provider == "all"
+            else (self.args.provider,)
+        )
+        return tuple(
+            Fetch(
+                provider,
+                tuple(sorted(params.items())),
+                bool(self.args.per_role),
+                self.args.patch,
+                bool(self.args.offline),
+                bool(self.args.stream_json),
+                self.args.cache_ttl,
+            )
+            for provider in providers
+            for params in (
+                expand_grid(service_classes[provider], self.args.sweep)
+                if self.args.sweep
+                else [{}]
+            )
+        )
+
+    def source(
+        self, service_classes: dict[str, type[BaseAPIService]]
+    ) -> tuple[str, tuple[Fetch, ...]]:
+        # Jobs with the same source are handed the same DataFrame.
+        kind = "sweep" if self.args.sweep else self.args.provider
+        return kind, self.fetches(service_classes)
+
+
+def read_job_file(path: str) -> dict[str, Any]:
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".toml":
+        import tomllib
+
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    if extension in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError as e:
+            raise ValueError(
+                "YAML job files need the PyYAML package, use a .toml file otherwise."
+            ) from e
+
+        with open(path) as f:
+            return yaml.safe_load(f) or {}
+
+    raise ValueError(f'Invalid job file: "{path}", expected .toml, .yaml or .yml')
+
+
+def job_argv(
+    options: dict[str, Any], known: Collection[str] | None = None
+) -> list[str]:
+    # Jobs are written with the CLI's own options and parsed like a command line.
+    options = dict(options)
+    argv = [str(options.pop("provider", ""))]
+    for key, value in options.items():
+        if key in RUN_OPTIONS:
+            raise ValueError(f'"{key}" can not be used in a batch job')
+        if known is not None and key.replace("-", "_") not in known:
+            raise ValueError(f'Unknown option: "{key}"')
+
+        flag = f"--{key.replace('_', '-')}"
+        if isinstance(value, bool):
+            argv.append(flag if value else f"--no-{flag[2:]}")
+        elif isinstance(value, dict):
+            for dimension, values in value.items():
+                values = values if isinstance(values, list) else [values]
+                argv += [flag, f"{dimension}={','.join(map(str, values))}"]
+        elif isinstance(value, list):
+            argv += [flag, ",".join(map(str, value))]
+        else:
+            argv += [flag, str(value)]
+
+    return argv
+
+
+def load_jobs(
+    path: str,
+    parse: Callable[[list[str]], argparse.Namespace],
+    known: Collection[str] | None = None,
+) -> list[Job]:
+    # `known` holds the option names a job may use, anything else is named as an error
+    # instead of reaching argparse, which would exit without saying which job it was.
+    content = read_job_file(path)
+    defaults = content.get("defaults", {})
+    if not content.get("jobs"):
+        raise ValueError(f'No jobs in: "{path}"')
+
+    jobs: dict[str, Job] = {}
+    for options in content["jobs"]:
+        options = {**defaults, **options}
+        name = str(options.pop("name", options.get("provider")))
+        destination = options.pop("path", f"results/{name}")
+        if name in jobs:
+            raise ValueError(f'Duplicate job name: "{name}", give each job a name')
+        try:
+            argv = job_argv(options, known)
+            if not any(options.get(key) for key in OUTPUT_OPTIONS):
+                raise ValueError(
+                    f"nothing to write, set one of: {', '.join(OUTPUT_OPTIONS)}"
+                )
+            jobs[name] = Job(name, parse(argv), destination)
+        except (ValueError, argparse.ArgumentError) as e:
+            raise ValueError(f'Invalid job "{name}": {e}') from e
+        except SystemExit as e:
+            # argparse exits on a value it can't convert, after printing why.
+            raise ValueError(f'Invalid job "{name}", see the error above') from e
+
+    return list(jobs.values())
@@ -1,53 +1,75 @@
+import json
 from dataclasses import dataclass
+from urllib.parse import quote, urlencode
 
-import requests
+from .columns import ChampionColumns
+from .utils import BaseAPIService, Providers
 
-from .utils import BaseAPIService, ChampionsData, Providers
+
+def tier_list_query(most_popular: bool = True) -> str:
+    # Without mostPopular the same query returns a row for every role a champion is played in.
+    return (
+        "query TierList($region:Region,$queue:Queue,$tier:Tier)"
+        f"{{allChampionStats(region:$region,queue:$queue,tier:$tier,mostPopular:{str(most_popular).lower()})"
+        "{championId role patch wins games tierListTier{tierRank previousTierRank status}}}"
+    )
+
+
+TIER_LIST_QUERY = tier_list_query()
 
 
 @dataclass(kw_only=True, slots=True)
 class Blitz(BaseAPIService):
-    def _api_call(self) -> dict:
-        self.params = "query=query%20TierList%28%24region%3ARegion%2C%24queue%3AQueue%2C%24tier%3ATier%29%7BallChampionStats%28region%3A%24region%2Cqueue%3A%24queue%2Ctier%3A%24tier%2CmostPopular%3Atrue%29%7BchampionId%20role%20patch%20wins%20games%20tierListTier%7BtierRank%20previousTierRank%20status%7D%7D%7D&variables=%7B%22queue%22%3A%22RANKED_SOLO_5X5%22%2C%22region%22%3A%22WORLD%22%2C%22tier%22%3A%22PLATINUM_PLUS%22%7D"
+    provider = Providers.BLITZ_GG
+    records_path = ("data", "allChampionStats")
+    record_keys = {
+        "id_key": "championId",
+        "games_key": "games",
+        "wins_key": "wins",
+        "role_key": "role",
+    }
+    dimensions = ("queue", "region", "tier")
+
+    queue: str = "RANKED_SOLO_5X5"
+    region: str = "WORLD"
+    tier: str = "PLATINUM_PLUS"
 
-        response: requests.Response = self.session.get(
-            Providers.fetch_links[Providers.BLITZ_GG],
-            headers=self.headers,
-            params=self.params,
+    def _api_call(self) -> dict:
+        variables = {
+            "queue": self.queue.upper(),
+            "region": self.region.upper(),
+            "tier": self.tier.upper(),
+        }
+        self.params = urlencode(
+            {
+                "query": tier_list_query(not self.per_role),
+                "variables": json.dumps(variables, separators=(",", ":")),
+            },
+            quote_via=quote,
+            safe="",
         )
-        if not response:
-            raise requests.HTTPError(
-                f"Could not fetch the data from {Providers.BLITZ_GG}"
-            )
 
-        self.response_data = response.json()
+        url = Providers.fetch_links[Providers.BLITZ_GG]
+        if self.stream:
+            self.records = self._fetch_records(url, self.params)
+        else:
+            self.response_data = self._fetch_json(url, self.params)
         return self.response_data
 
     def _sanitize_data(self):
-        self.champions_data["Provider"] = Providers.BLITZ_GG
-        for champion in self.response_data["data"]["allChampionStats"]:
-            self.champions_data["ChampionId"].append(champion["championId"])
-            self.champions_data["ChampionName"].append(
-                self.champions_names[str(champion["championId"])]
-            )
-            self.champions_data["Role"].append(
-                champion["role"].upper()
-                if "adc" in champion["role"].lower()
-                else champion["role"].title()
-            )
-            self.champions_data["TotalGames"].append(champion["games"])
-            self.champions_data["Wins"].append(champion["wins"])
-            self.champions_data["Losses"].append(champion["games"] - champion["wins"])
-            self.champions_data["Winrate"].append(
-                self.calculate_winrate_percentage(
-                    float, champion["wins"], champion["games"]
-                )
-            )
-
-        self.complete_missing_champions_data(float)
-
-    def get_stats(self) -> ChampionsData:
+        records = (
+            self.records
+            if self.records is not None
+            else self.response_data["data"]["allChampionStats"]
+        )
+        self._sanitize_records(records, **self.record_keys)
+        # Only the typed columns are kept, the raw records can be collected.
+        self.records = None
+
+        self.complete_missing_champions_data()
+
+    def get_stats(self) -> ChampionColumns:
         self._api_call()
         self._sanitize_data()
 
-        return self.champions_data
+        return self.columns
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+DEFAULT_TTL = 600.0
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    # Readers see the old file or the new one, never a partial write.
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+@dataclass(slots=True)
+class CachedResponse:
+    body: bytes
+    etag: str | None
+    last_modified: str | None
+    stored_at: float
+
+
+@dataclass(slots=True)
+class ResponseCache:
+    directory: str = ".cache/responses"
+    # Seconds a stored response is served without asking the provider again,
+    # stale entries are revalidated with ETag/Last-Modified instead of refetched.
+    ttl: float = DEFAULT_TTL
+    max_bytes: int = 64 * 1024 * 1024
+    _lock: threading.Lock = field(
+        init=False, repr=False, default_factory=threading.Lock
+    )
+
+    @staticmethod
+    def key(provider: str, url: str, params: dict | str) -> str:
+        raw = json.dumps([provider, url, params], sort_keys=True)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _paths(self, key: str) -> tuple[str, str]:
+        base = os.path.join(self.directory, key)
+        return f"{base}.body", f"{base}.meta.json"
+
+    def get(self, key: str) -> CachedResponse | None:
+        body_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        # Reads count as use, eviction drops the least recently used entries first.
+        try:
+            os.utime(body_path)
+        except FileNotFoundError:
+            # Evicted by another process since, the body was read whole all the same.
+            pass
+        return CachedResponse(
+            body=body,
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+            stored_at=meta["stored_at"],
+        )
+
+    def is_fresh(self, entry: CachedResponse) -> bool:
+        return time.time() - entry.stored_at < self.ttl
+
+    def put(
+        self,
+        key: str,
+        body: bytes,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> None:
+        body_path, meta_path = self._paths(key)
+        meta = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": time.time(),
+        }
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            write_atomic(body_path, body)
+            write_atomic(meta_path, json.dumps(meta).encode())
+            self._evict()
+
+    def put_chunks(
+        self,
+        key: str,
+        chunks: Iterable[bytes],
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> Iterator[bytes]:
+        # Hands every chunk on while spooling it to disk, the entry is only
+        # replaced once the whole body went through.
+        body_path, meta_path = self._paths(key)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{body_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        complete = False
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            complete = True
+        finally:
+            if not complete:
+                try:
+                    os.remove(tmp_path)
+                except FileNotFoundError:
+                    pass
+
+        meta = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": time.time(),
+        }
+        with self._lock:
+            os.replace(tmp_path, body_path)
+            write_atomic(meta_path, json.dumps(meta).encode())
+            self._evict()
+
+    def touch(self, key: str) -> None:
+        entry = self.get(key)
+        if entry is not None:
+            self.put(key, entry.body, entry.etag, entry.last_modified)
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".body"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        for _, size, body_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in (body_path, body_path.removesuffix(".body") + ".meta.json"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
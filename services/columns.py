@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from .utils import ChampionsData
+
+# DataFrame column -> attribute, in the order the columns are built.
+COLUMNS = {
+    "ChampionId": "champion_id",
+    "ChampionName": "champion_name",
+    "Role": "role",
+    "TotalGames": "total_games",
+    "Wins": "wins",
+    "Losses": "losses",
+    "Winrate": "winrate",
+    "Provider": "provider",
+}
+
+
+def winrate_percentages(wins: np.ndarray, games: np.ndarray) -> np.ndarray:
+    ratios = np.divide(
+        wins, games, out=np.zeros(len(wins), dtype=np.float64), where=games > 0
+    )
+
+    return np.round(ratios * 100, 2)
+
+
+@lru_cache(maxsize=32)
+def names_dtype(names: tuple[str, ...]) -> pd.CategoricalDtype:
+    # One categories index per champions registry, shared by every snapshot built from it.
+    return pd.CategoricalDtype(names)
+
+
+@dataclass(frozen=True, slots=True)
+class ChampionColumns:
+    # One typed array per column: counts are int64, the winrate is always a
+    # float64 percentage and repeated strings are categorical codes.
+    champion_id: np.ndarray
+    champion_name: pd.Categorical
+    role: pd.Categorical
+    total_games: np.ndarray
+    wins: np.ndarray
+    losses: np.ndarray
+    winrate: np.ndarray
+    provider: pd.Categorical
+
+    @classmethod
+    def from_arrays(
+        cls,
+        champion_id: np.ndarray,
+        champion_name: pd.Categorical,
+        role: pd.Categorical,
+        total_games: np.ndarray,
+        wins: np.ndarray,
+        provider: str,
+    ) -> ChampionColumns:
+        total_games = np.asarray(total_games, dtype=np.int64)
+        wins = np.asarray(wins, dtype=np.int64)
+
+        return cls(
+            champion_id=np.asarray(champion_id, dtype=np.int64),
+            champion_name=champion_name,
+            role=role,
+            total_games=total_games,
+            wins=wins,
+            losses=total_games - wins,
+            winrate=winrate_percentages(wins, total_games),
+            provider=pd.Categorical.from_codes(
+                np.zeros(len(wins), dtype=np.int8), categories=[provider]
+            ),
+        )
+
+    def __len__(self) -> int:
+        return len(self.champion_id)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, attribute).nbytes for attribute in COLUMNS.values())
+
+    def concat(self, *others: ChampionColumns) -> ChampionColumns:
+        from pandas.api.types import union_categoricals
+
+        parts = (self, *others)
+        return ChampionColumns(
+            **{
+                attribute: union_categoricals(
+                    [getattr(part, attribute) for part in parts]
+                )
+                if isinstance(getattr(self, attribute), pd.Categorical)
+                else np.concatenate([getattr(part, attribute) for part in parts])
+                for attribute in COLUMNS.values()
+            }
+        )
+
+    def take(self, indices: np.ndarray) -> ChampionColumns:
+        return ChampionColumns(
+            **{
+                attribute: getattr(self, attribute)[indices]
+                for attribute in COLUMNS.values()
+            }
+        )
+
+    def unique(self, per_role: bool = False) -> ChampionColumns:
+        # First row of every champion (and role), without a copy when there are no duplicates.
+        keys = self.champion_id
+        if per_role:
+            keys = np.stack(
+                [self.champion_id, self.role.codes.astype(np.int64)], axis=1
+            )
+        _, first = np.unique(keys, axis=0, return_index=True)
+        if len(first) == len(self):
+            return self
+        return self.take(np.sort(first))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        # The frame wraps these arrays as they are, nothing is copied.
+        return pd.DataFrame(
+            {column: getattr(self, attribute) for column, attribute in COLUMNS.items()},
+            copy=False,
+        )
+
+    def to_dict(self) -> ChampionsData:
+        return {
+            column: getattr(self, attribute).tolist()
+            for column, attribute in COLUMNS.items()
+        }
@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Callable
+
+from .cache import write_atomic
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+
+XLSX_COLUMN_MARGIN = 3
+XLSX_INVALID_SHEET_CHARS = str.maketrans("", "", "[]:*?/\\")
+
+
+def _xlsx_column_widths(frame: pd.DataFrame) -> list[int]:
+    # One vectorized length pass per column instead of walking every written cell.
+    return [
+        max(len(str(column)), int(frame[column].astype(str).str.len().max() or 0))
+        + XLSX_COLUMN_MARGIN
+        for column in frame.columns
+    ]
+
+
+def write_xlsx_stream(
+    dataframe: pd.DataFrame, file_path: str, sheet_by: str | None = None
+) -> None:
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+
+    frame = dataframe.reset_index()
+    if sheet_by is None:
+        sheets = [("Sheet1", frame)]
+    elif sheet_by not in frame.columns:
+        raise ValueError(f"Invalid sheet column: {sheet_by}")
+    else:
+        sheets = [
+            (str(name).translate(XLSX_INVALID_SHEET_CHARS)[:31] or "-", rows)
+            for name, rows in frame.groupby(sheet_by, sort=True, observed=True)
+        ]
+
+    # Write-only workbooks stream rows to a temporary file instead of keeping cells.
+    workbook = Workbook(write_only=True)
+    for title, rows in sheets:
+        sheet = workbook.create_sheet(title)
+        for i, width in enumerate(_xlsx_column_widths(rows), start=1):
+            sheet.column_dimensions[get_column_letter(i)].width = width
+        sheet.append(list(rows.columns))
+        for row in rows.itertuples(index=False, name=None):
+            sheet.append(row)
+
+    workbook.save(file_path)
+
+
+def write_xlsx(
+    dataframe: pd.DataFrame,
+    file_path: str,
+    streaming: bool = False,
+    sheet_by: str | None = None,
+) -> None:
+    if streaming or sheet_by:
+        return write_xlsx_stream(dataframe, file_path, sheet_by)
+
+    import pandas as pd
+    from UliPlot.XLSX import auto_adjust_xlsx_column_width
+
+    # UliPlot takes the max of the value lengths, which categoricals don't allow.
+    plain = dataframe.astype(
+        {
+            column: object
+            for column, dtype in dataframe.dtypes.items()
+            if isinstance(dtype, pd.CategoricalDtype)
+        }
+    )
+    with pd.ExcelWriter(file_path) as writer:
+        dataframe.to_excel(writer)
+        auto_adjust_xlsx_column_width(
+            plain, writer, sheet_name="Sheet1", margin=XLSX_COLUMN_MARGIN
+        )
+
+
+def write_csv(dataframe: pd.DataFrame, file_path: str) -> None:
+    dataframe.to_csv(file_path)
+
+
+def dataframe_json(dataframe: pd.DataFrame, file_path: str | None = None) -> str | None:
+    # A single index keeps pandas' default column orient. A MultiIndex (all
+    # providers, per-role) would become stringified tuple keys, so those frames
+    # are written as one object per row instead.
+    if dataframe.index.nlevels > 1:
+        return dataframe.reset_index().to_json(file_path, orient="records")
+    return dataframe.to_json(file_path)
+
+
+def write_json(dataframe: pd.DataFrame, file_path: str) -> None:
+    dataframe_json(dataframe, file_path)
+
+
+def write_ndjson(dataframe: pd.DataFrame, file_path: str) -> None:
+    dataframe.reset_index().to_json(file_path, orient="records", lines=True)
+
+
+def write_txt(dataframe: pd.DataFrame, file_path: str) -> None:
+    with open(file_path, "w") as f:
+        f.write(dataframe.to_string())
+
+
+def write_parquet(dataframe: pd.DataFrame, file_path: str) -> None:
+    dataframe.to_parquet(file_path)
+
+
+def write_feather(dataframe: pd.DataFrame, file_path: str) -> None:
+    # Arrow IPC files can't hold a pandas index, it's kept as regular columns.
+    dataframe.reset_index().to_feather(file_path)
+
+
+WRITERS: dict[str, Callable[..., None]] = {
+    "xlsx": write_xlsx,
+    "csv": write_csv,
+    "json": write_json,
+    "ndjson": write_ndjson,
+    "txt": write_txt,
+    "parquet": write_parquet,
+    "feather": write_feather,
+}
+
+# Pure Python writers hold the GIL for their whole run, they get their own process.
+PROCESS_WRITERS = frozenset({"xlsx"})
+# Optional packages some writers need, checked before anything is fetched.
+WRITER_PACKAGES = {"parquet": "pyarrow", "feather": "pyarrow"}
+
+
+def export_file_path(path: str, date_time: str, export_type: str) -> str:
+    return f"{path}/data/results_{date_time}.{export_type}"
+
+
+def write(dataframe: pd.DataFrame, export_type: str, file_path: str, **options) -> str:
+    if export_type not in WRITERS:
+        raise ValueError(f"Invalid type: {export_type}")
+
+    # Written next to the target and renamed over it, a crash never leaves a
+    # truncated export behind. The extension is kept for writers that dispatch on it.
+    root, extension = os.path.splitext(file_path)
+    tmp_path = f"{root}.{os.getpid()}.{threading.get_ident()}.tmp{extension}"
+    try:
+        WRITERS[export_type](dataframe, tmp_path, **options)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return file_path
+
+
+def write_many(
+    dataframe: pd.DataFrame,
+    export_types: list[str],
+    path: str,
+    date_time: str,
+    max_workers: int | None = None,
+    options: dict[str, dict] | None = None,
+) -> dict[str, str]:
+    # Writer specific keyword arguments, keyed by export type.
+    options = options or {}
+    for export_type in export_types:
+        if export_type not in WRITERS:
+            raise ValueError(f"Invalid type: {export_type}")
+
+    export_types = list(dict.fromkeys(export_types))
+    if len(export_types) == 1:
+        export_type = export_types[0]
+        return {
+            export_type: write(
+                dataframe,
+                export_type,
+                export_file_path(path, date_time, export_type),
+                **options.get(export_type, {}),
+            )
+        }
+
+    processes = [t for t in export_types if t in PROCESS_WRITERS]
+    threads = [t for t in export_types if t not in PROCESS_WRITERS]
+    executors: list[tuple[Executor, list[str]]] = []
+    # The processes are forked on their first submit, before any writer thread exists.
+    if processes:
+        executors.append(
+            (ProcessPoolExecutor(max_workers=max_workers or len(processes)), processes)
+        )
+    if threads:
+        executors.append(
+            (ThreadPoolExecutor(max_workers=max_workers or len(threads)), threads)
+        )
+
+    futures = {}
+    try:
+        for executor, types in executors:
+            for export_type in types:
+                futures[export_type] = executor.submit(
+                    write,
+                    dataframe,
+                    export_type,
+                    export_file_path(path, date_time, export_type),
+                    **options.get(export_type, {}),
+                )
+        return {
+            export_type: futures[export_type].result() for export_type in export_types
+        }
+    finally:
+        for executor, _ in executors:
+            executor.shutdown()
+
+
+def frame_digest(dataframe: pd.DataFrame) -> str:
+    # Hashes the values and index of every row at once, no text rendering involved.
+    digest = hashlib.sha256(
+        json.dumps(
+            [list(map(str, dataframe.index.names)), list(dataframe.columns)]
+        ).encode()
+    )
+    digest.update(row_digests(dataframe).tobytes())
+    return digest.hexdigest()
+
+
+def row_digests(dataframe: pd.DataFrame) -> np.ndarray:
+    import pandas as pd
+
+    return pd.util.hash_pandas_object(dataframe, index=True).to_numpy()
+
+
+def manifest_path(path: str) -> str:
+    return f"{path}/data/manifest.json"
+
+
+@dataclass(slots=True)
+class ExportManifest:
+    # Digest of the last exported snapshot and of its rows, for delta exports.
+    digest: str | None = None
+    rows: list[int] = field(default_factory=list)
+    # Export type -> the last full export and the digest of its content.
+    files: dict[str, dict[str, str]] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: str) -> ExportManifest:
+        try:
+            with open(manifest_path(path)) as f:
+                return cls(**json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError, TypeError):
+            return cls()
+
+    def save(self, path: str) -> None:
+        write_atomic(manifest_path(path), json.dumps(asdict(self)).encode())
+
+    def reusable(self, export_type: str, digest: str) -> str | None:
+        entry = self.files.get(export_type)
+        if entry and entry["digest"] == digest and os.path.exists(entry["path"]):
+            return entry["path"]
+        return None
+
+
+def write_changed(
+    dataframe: pd.DataFrame,
+    export_types: list[str],
+    path: str,
+    date_time: str,
+    delta: bool = False,
+    options: dict[str, dict] | None = None,
+) -> tuple[dict[str, str], dict[str, str]]:
+    # Returns the written files and the unchanged ones they refer back to.
+    import numpy as np
+
+    manifest = ExportManifest.load(path)
+    rows = row_digests(dataframe)
+    digest = frame_digest(dataframe)
+
+    if delta:
+        # Rows whose champion and stats were both in the previous snapshot are unchanged.
+        changed = ~np.isin(rows, np.array(manifest.rows, dtype=np.uint64))
+        written = {}
+        if changed.any():
+            written = write_many(
+                dataframe[changed],
+                export_types,
+                path,
+                f"{date_time}_delta",
+                options=options,
+            )
+        references = {}
+    else:
+        references = {
+            export_type: reference
+            for export_type in dict.fromkeys(export_types)
+            if (reference := manifest.reusable(export_type, digest))
+        }
+        missing = [t for t in export_types if t not in references]
+        written = (
+            write_many(dataframe, missing, path, date_time, options=options)
+            if missing
+            else {}
+        )
+        manifest.files.update(
+            {
+                export_type: {"path": file_path, "digest": digest}
+                for export_type, file_path in written.items()
+            }
+        )
+
+    manifest.digest = digest
+    manifest.rows = rows.tolist()
+    manifest.save(path)
+    return written, references
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import codecs
+import json
+from array import array
+from typing import Iterable, Iterator
+
+SEPARATORS = " \t\n\r,"
+DELIMITERS = SEPARATORS + "]"
+_decoder = json.JSONDecoder()
+
+
+def _text_chunks(chunks: Iterable[bytes]) -> Iterator[str]:
+    # Multi-byte characters split across network chunks are held back until complete.
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in chunks:
+        if text := decoder.decode(chunk):
+            yield text
+    if text := decoder.decode(b"", final=True):
+        yield text
+
+
+def _find_array(text: Iterator[str], path: tuple[str, ...]) -> str:
+    # Walks the document character by character only until the array at path
+    # opens, then returns what is left of the buffer after its "[".
+    containers: list[str] = []
+    keys: list[str | None] = []
+    in_string = escaped = expecting_key = False
+    string: list[str] = []
+    last_string = None
+
+    for buffer in text:
+        for i, char in enumerate(buffer):
+            if in_string:
+                if escaped:
+                    escaped = False
+                    string.append(char)
+                elif char == "\\":
+                    escaped = True
+                    string.append(char)
+                elif char == '"':
+                    in_string = False
+                    last_string = json.loads(f'"{"".join(string)}"')
+                else:
+                    string.append(char)
+                continue
+
+            if char == '"':
+                in_string, string = True, []
+            elif char == "{":
+                containers.append("{")
+                keys.append(None)
+                expecting_key = True
+            elif char == "[":
+                if "[" not in containers and containers and tuple(keys) == path:
+                    return buffer[i + 1 :]
+                containers.append("[")
+            elif char in "}]":
+                if containers.pop() == "{":
+                    keys.pop()
+                expecting_key = False
+            elif char == ":" and expecting_key:
+                keys[-1] = last_string
+                expecting_key = False
+            elif char == "," and containers and containers[-1] == "{":
+                expecting_key = True
+
+    raise ValueError(f"No array at {'.'.join(path)} in the response.")
+
+
+def iter_array(chunks: Iterable[bytes], path: tuple[str, ...]) -> Iterator[object]:
+    # Items are yielded as soon as they are complete, the document around them is never built.
+    text = _text_chunks(chunks)
+    buffer = _find_array(text, path)
+    position = 0
+
+    while True:
+        while position < len(buffer) and buffer[position] in SEPARATORS:
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+
+        try:
+            item, end = _decoder.raw_decode(buffer, position)
+            # A number is only complete once a delimiter follows it, "2." or "-"
+            # at the end of a chunk may still continue in the next one.
+            complete = isinstance(item, (dict, list, str)) or (
+                end < len(buffer) and buffer[end] in DELIMITERS
+            )
+        except json.JSONDecodeError:
+            complete = False
+
+        if complete:
+            yield item
+            position = end
+            continue
+
+        chunk = next(text, None)
+        if chunk is None:
+            raise ValueError(f"Truncated array at {'.'.join(path)} in the response.")
+        # Only the unparsed tail is kept, parsed items are never held twice.
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def collect_columns(
+    records: Iterable[dict], int_keys: tuple[str, ...], keys: tuple[str, ...] = ()
+) -> dict[str, array | list]:
+    # Every record is copied into its columns and dropped right away, integer
+    # columns are packed machine ints that NumPy can wrap without copying.
+    columns: dict[str, array | list] = {key: array("q") for key in int_keys}
+    columns.update({key: [] for key in keys})
+    appends = [(key, columns[key].append) for key in (*int_keys, *keys)]
+    for record in records:
+        for key, append in appends:
+            append(record[key])
+
+    return columns
@@ -1,59 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
-import requests
-from colorama import Fore
+from .columns import ChampionColumns
+from .utils import BaseAPIService, Providers
 
-from .utils import BaseAPIService, ChampionsData, Providers
+POSITIONS = ("top", "jungle", "mid", "adc", "support")
 
 
 @dataclass(kw_only=True, slots=True)
 class OPGG(BaseAPIService):
+    provider = Providers.OP_GG
+    records_path = ("data",)
+    record_keys = {
+        "id_key": "champion_id",
+        "games_key": "play",
+        "wins_key": "win",
+    }
+    dimensions = ("period", "tier", "position")
+
+    period: str = "month"
+    tier: str = "platinum_plus"
+    position: str = ""
+
+    @classmethod
+    def fan_out(cls, per_role: bool = False) -> int:
+        return len(POSITIONS) if per_role else 1
+
     def _api_call(self) -> dict:
         self.params = {
-            "period": "month",
-            "tier": "platinum_plus",
-            "position": "",
+            "period": self.period.lower(),
+            "tier": self.tier.lower(),
+            "position": self.position.lower(),
         }
 
-        response: requests.Response = self.session.get(
-            Providers.fetch_links[Providers.OP_GG],
-            headers=self.headers,
-            params=self.params,
-        )
-
-        print(
-            f"\t\N{black question mark ornament}{Fore.LIGHTCYAN_EX} Checking for the response validation..."
-        )
-        if not response:
-            raise requests.HTTPError(f"Could not fetch the data from {Providers.OP_GG}")
-
-        self.response_data = response.json()
-        print(
-            f"\t\t{Fore.LIGHTGREEN_EX}\N{check mark} Response code and data are valid!"
-        )
+        url = Providers.fetch_links[Providers.OP_GG]
+        if self.per_role:
+            # The API filters one position per request, the five run side by side.
+            with ThreadPoolExecutor(max_workers=len(POSITIONS)) as executor:
+                records = executor.map(
+                    lambda position: self._fetch_position(url, position), POSITIONS
+                )
+                self.response_data = {"positions": dict(zip(POSITIONS, records))}
+        elif self.stream:
+            self.records = self._fetch_records(url, self.params)
+        else:
+            self.response_data = self._fetch_json(url, self.params)
         return self.response_data
 
-    def _sanitize_data(self):
-        self.champions_data["Provider"] = Providers.OP_GG
-        self.champions_data["Role"] = "-"
+    def _fetch_position(self, url: str, position: str) -> list[dict] | dict:
+        params = {**self.params, "position": position}
+        if self.stream:
+            return self._fetch_records(url, params)
+        return self._fetch_json(url, params)["data"]
 
-        for champion in self.response_data["data"]:
-            self.champions_data["ChampionId"].append(champion["champion_id"])
-            self.champions_data["ChampionName"].append(
-                self.champions_names[str(champion["champion_id"])]
-            )
-            self.champions_data["TotalGames"].append(champion["play"])
-            self.champions_data["Wins"].append(champion["win"])
-            self.champions_data["Losses"].append(champion["play"] - champion["win"])
-            self.champions_data["Winrate"].append(
-                self.calculate_winrate_percentage(
-                    float, champion["win"], champion["play"]
-                )
+    def _sanitize_data(self):
+        if self.per_role:
+            parts = []
+            for position, records in self.response_data["positions"].items():
+                self._sanitize_records(records, role=position, **self.record_keys)
+                parts.append(self.columns)
+            self.columns = parts[0].concat(*parts[1:])
+            self.response_data = {}
+        else:
+            records = (
+                self.records if self.records is not None else self.response_data["data"]
             )
+            self._sanitize_records(records, **self.record_keys)
+            # Only the typed columns are kept, the raw records can be collected.
+            self.records = None
 
-        self.complete_missing_champions_data(float)
+        self.complete_missing_champions_data()
 
-    def get_stats(self) -> ChampionsData:
+    def get_stats(self) -> ChampionColumns:
         print(f"\N{telephone receiver} Calling the {Providers.OP_GG} API...")
         self._api_call()
         # print(f"{Fore.LIGHTGREEN_EX} Done!")
@@ -61,4 +79,4 @@ class OPGG(BaseAPIService):
         print(f"\N{lotion bottle} Sanitizing the received data...")
         self._sanitize_data()
 
-        return self.champions_data
+        return self.columns
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+PLOT_FORMATS = ("png", "svg")
+# Matches the original 10x75 inches chart for ~160 champions.
+INCHES_PER_BAR = 0.47
+
+
+@dataclass(frozen=True, slots=True)
+class PlotJob:
+    # Only the two plotted columns, so sending a job to a worker process stays cheap.
+    data: pd.DataFrame
+    file_path: str
+    title: str | None = None
+    dpi: int = 100
+
+
+def render(job: PlotJob) -> str:
+    # Figures are built straight on the Agg canvas, pyplot's global figure
+    # manager is never touched, so renders can run side by side.
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    labels, values = job.data.columns
+    figure = Figure(figsize=(10, max(2.0, len(job.data) * INCHES_PER_BAR)))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.barh(range(len(job.data)), job.data[values], height=0.5)
+    axes.set_yticks(range(len(job.data)), job.data[labels].astype(str))
+    axes.set_ylabel(labels)
+    axes.set_xlabel(values)
+    axes.set_ylim(-0.5, len(job.data) - 0.5)
+    if job.title:
+        axes.set_title(job.title)
+    # Default margins are figure fractions, on tall charts they become inches of blank space.
+    figure.tight_layout()
+    figure.savefig(job.file_path, dpi=job.dpi)
+
+    return job.file_path
+
+
+def _slug(value: object) -> str:
+    return re.sub(r"[^A-Za-z0-9.]+", "-", str(value)).strip("-") or "-"
+
+
+def plan(
+    dataframe: pd.DataFrame,
+    base_path: str,
+    plot_format: str = "png",
+    by: str | None = None,
+    top: int | None = None,
+    dpi: int = 100,
+    column: str = "Winrate",
+    label: str = "ChampionName",
+) -> list[PlotJob]:
+    if plot_format not in PLOT_FORMATS:
+        raise ValueError(f"Invalid plot format: {plot_format}")
+
+    frame = dataframe.reset_index()
+    if by is not None and by not in frame.columns:
+        raise ValueError(f"Invalid plot column: {by}")
+
+    groups = [(None, frame)]
+    if by is not None:
+        groups += list(frame.groupby(by, sort=True, observed=True))
+
+    jobs = []
+    for value, rows in groups:
+        data = rows.loc[:, [label, column]]
+        if top:
+            data = data.nlargest(top, column)
+        suffix = "" if value is None else f"_{_slug(by)}-{_slug(value)}"
+        jobs.append(
+            PlotJob(
+                data=data,
+                file_path=f"{base_path}{suffix}.{plot_format}",
+                title=None if value is None else f"{by}: {value}",
+                dpi=dpi,
+            )
+        )
+
+    return jobs
+
+
+def render_many(jobs: list[PlotJob], max_workers: int | None = None) -> list[str]:
+    if len(jobs) == 1:
+        return [render(jobs[0])]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(render, jobs))
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Iterator
+
+
+@dataclass(slots=True)
+class StageRecord:
+    name: str
+    parent: str | None
+    thread: str
+    # Seconds since the trace started.
+    start: float
+    wall: float = 0.0
+    # CPU time of the thread running the stage, work handed to other threads
+    # or processes is recorded by their own stages.
+    cpu: float = 0.0
+    bytes: int | None = None
+    rows: int | None = None
+    attrs: dict[str, object] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class Tracer:
+    started: float = field(default_factory=time.perf_counter)
+    started_at: float = field(default_factory=time.time)
+    stages: list[StageRecord] = field(default_factory=list)
+    _lock: threading.Lock = field(
+        init=False, repr=False, default_factory=threading.Lock
+    )
+    _local: threading.local = field(
+        init=False, repr=False, default_factory=threading.local
+    )
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **attrs) -> Iterator[StageRecord]:
+        stack = self._local.__dict__.setdefault("stack", [])
+        record = StageRecord(
+            name=name,
+            parent=stack[-1].name if stack else None,
+            thread=threading.current_thread().name,
+            start=time.perf_counter() - self.started,
+            attrs=attrs,
+        )
+        stack.append(record)
+        cpu = time.thread_time()
+        try:
+            yield record
+        finally:
+            record.cpu = time.thread_time() - cpu
+            record.wall = time.perf_counter() - self.started - record.start
+            stack.pop()
+            with self._lock:
+                self.stages.append(record)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            stages = sorted(self.stages, key=lambda stage: stage.start)
+        return {
+            "argv": sys.argv,
+            "started_at": self.started_at,
+            "wall": time.perf_counter() - self.started,
+            "stages": [asdict(stage) for stage in stages],
+        }
+
+
+@dataclass(slots=True)
+class Profiler:
+    # cProfile only sees the thread that enabled it, stages on worker threads
+    # still show up in the trace with their wall and CPU time.
+    top: int = 25
+    _profile: object = field(init=False, repr=False, default=None)
+
+    def start(self) -> None:
+        import cProfile
+        import tracemalloc
+
+        tracemalloc.start()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def stop(self, profile_path: str | None = None) -> dict:
+        import pstats
+        import tracemalloc
+
+        self._profile.disable()
+        if profile_path:
+            self._profile.dump_stats(profile_path)
+
+        stats = pstats.Stats(self._profile)
+        hot = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[
+            : self.top
+        ]
+        _, peak = tracemalloc.get_traced_memory()
+        allocations = tracemalloc.take_snapshot().statistics("lineno")[: self.top]
+        tracemalloc.stop()
+
+        return {
+            "hot_functions": [
+                {
+                    "function": f"{file}:{line}({function})",
+                    "calls": calls,
+                    "own": own,
+                    "cumulative": cumulative,
+                }
+                for (file, line, function), (_, calls, own, cumulative, _) in hot
+            ],
+            "peak_memory": peak,
+            "allocations": [
+                {"where": str(statistic.traceback), "size": statistic.size}
+                for statistic in allocations
+            ],
+        }
+
+
+# Disabled unless --trace-out/--profile enabled it, stage() is then a no-op.
+_tracer: Tracer | None = None
+
+
+def enable() -> Tracer:
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable() -> None:
+    global _tracer
+    _tracer = None
+
+
+@contextlib.contextmanager
+def stage(name: str, **attrs) -> Iterator[StageRecord]:
+    tracer = _tracer
+    if tracer is None:
+        # A detached record, so callers can fill it in without checking.
+        yield StageRecord(name=name, parent=None, thread="", start=0.0)
+        return
+
+    with tracer.stage(name, **attrs) as record:
+        yield record
+
+
+def file_size(*paths: str) -> int:
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+def write_trace(file_path: str, tracer: Tracer, profile: dict | None = None) -> None:
+    trace = tracer.to_dict()
+    if profile is not None:
+        trace["profile"] = profile
+
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w") as f:
+        json.dump(trace, f, indent=2, default=str)
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Mapping
+
+import numpy as np
+
+from .exporters import dataframe_json
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Query parameter -> column it filters on, matching any of its comma separated values.
+FILTERS = {"champion": "ChampionId", "role": "Role", "provider": "Provider"}
+PAGING = ("sort", "fields", "limit", "offset", "cursor")
+# Short names accepted by the min_/max_ thresholds.
+ALIASES = {"games": "totalgames"}
+
+
+class QueryError(ValueError):
+    pass
+
+
+class StaleCursor(QueryError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class Page:
+    rows: np.ndarray
+    fields: list[str] | None
+    total: int
+    offset: int
+    next_cursor: str | None
+
+
+@dataclass(frozen=True, slots=True)
+class SnapshotIndex:
+    # Built once per snapshot, a query only intersects and slices these arrays.
+    frame: pd.DataFrame
+    etag: str
+    # The columns the snapshot's index was reset into, restored for every page.
+    index_names: list[str]
+    # Lowercased column name -> column name.
+    columns: dict[str, str]
+    # Column -> row positions ordered by its values, and those values in that order.
+    orders: dict[str, np.ndarray]
+    sorted_values: dict[str, np.ndarray]
+    # Filter -> lowercased value -> row positions.
+    postings: dict[str, dict[str, np.ndarray]]
+    # Every row rendered as a JSON object, joined as they are for full rows of a
+    # MultiIndex snapshot, the others are served in pandas' column orient.
+    records: list[str]
+
+    @classmethod
+    def from_dataframe(cls, dataframe: pd.DataFrame, etag: str) -> SnapshotIndex:
+        import pandas as pd
+
+        frame = dataframe.reset_index()
+        orders = {}
+        sorted_values = {}
+        for column in frame.columns:
+            values = frame[column]
+            if pd.api.types.is_numeric_dtype(values):
+                values = values.to_numpy()
+                orders[column] = np.argsort(values, kind="stable")
+                sorted_values[column] = values[orders[column]]
+            else:
+                orders[column] = np.argsort(
+                    values.astype(str).str.lower().to_numpy(), kind="stable"
+                )
+
+        postings = {}
+        for name, column in FILTERS.items():
+            if column not in frame.columns:
+                continue
+            keys = [frame[column].astype(str).str.lower()]
+            # Champions are matched by ID or by name.
+            if name == "champion" and "ChampionName" in frame.columns:
+                keys.append(frame["ChampionName"].astype(str).str.lower())
+            postings[name] = {}
+            for key in keys:
+                for value, positions in key.groupby(key, sort=False).indices.items():
+                    existing = postings[name].get(value)
+                    postings[name][value] = (
+                        positions
+                        if existing is None
+                        else np.union1d(existing, positions)
+                    )
+
+        return cls(
+            frame=frame,
+            etag=etag,
+            index_names=list(frame.columns[: dataframe.index.nlevels]),
+            columns={str(column).lower(): column for column in frame.columns},
+            orders=orders,
+            sorted_values=sorted_values,
+            postings=postings,
+            records=[
+                json.dumps(record, separators=(",", ":"))
+                for record in json.loads(frame.to_json(orient="records"))
+            ]
+            if dataframe.index.nlevels > 1
+            else [],
+        )
+
+    def column(self, name: str) -> str:
+        name = name.strip().lower()
+        column = self.columns.get(ALIASES.get(name, name))
+        if column is None:
+            raise QueryError(f'Invalid column: "{name}"')
+        return column
+
+    def _threshold(self, key: str, value: str) -> np.ndarray:
+        bound, _, name = key.partition("_")
+        column = self.column(name)
+        if column not in self.sorted_values:
+            raise QueryError(f'"{column}" is not numeric')
+        try:
+            threshold = float(value)
+        except ValueError as e:
+            raise QueryError(f'Invalid {key}: "{value}"') from e
+
+        values = self.sorted_values[column]
+        # NaNs are sorted last and never match a threshold.
+        stop = np.searchsorted(values, np.inf, "right")
+        if bound == "min":
+            start = np.searchsorted(values, threshold, "left")
+        else:
+            start, stop = 0, min(stop, np.searchsorted(values, threshold, "right"))
+        return self.orders[column][start:stop]
+
+    def _cursor(self, offset: int) -> str:
+        return base64.urlsafe_b64encode(f"{self.etag}:{offset}".encode()).decode()
+
+    def _offset(self, args: Mapping[str, str]) -> int:
+        if "cursor" in args:
+            try:
+                etag, _, offset = (
+                    base64.urlsafe_b64decode(args["cursor"]).decode().partition(":")
+                )
+                offset = int(offset)
+            except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+                raise QueryError("Invalid cursor") from e
+            # Positions of an older snapshot mean nothing in this one.
+            if etag != self.etag:
+                raise StaleCursor("The data changed, start again from the first page")
+            return offset
+
+        return self._integer(args, "offset", 0)
+
+    @staticmethod
+    def _integer(args: Mapping[str, str], name: str, default: int | None) -> int | None:
+        if name not in args:
+            return default
+        try:
+            value = int(args[name])
+        except ValueError as e:
+            raise QueryError(f'Invalid {name}: "{args[name]}"') from e
+        if value < 0:
+            raise QueryError(f'Invalid {name}: "{value}", must not be negative')
+        return value
+
+    def select(self, args: Mapping[str, str]) -> Page:
+        size = len(self.frame)
+        mask = None
+        for key, value in args.items():
+            if key in FILTERS:
+                postings = self.postings.get(key, {})
+                positions = [
+                    postings.get(item.strip().lower(), np.empty(0, dtype=np.int64))
+                    for item in value.split(",")
+                ]
+                positions = np.concatenate(positions)
+            elif key.startswith(("min_", "max_")):
+                positions = self._threshold(key, value)
+            elif key in PAGING or key.startswith("_"):
+                # Underscored parameters are cache busters, like jQuery's "_".
+                continue
+            else:
+                raise QueryError(f'Invalid parameter: "{key}"')
+
+            matches = np.zeros(size, dtype=bool)
+            matches[positions] = True
+            mask = matches if mask is None else mask & matches
+
+        order = np.arange(size)
+        if args.get("sort"):
+            sort = args["sort"].strip()
+            column = self.column(sort.lstrip("-"))
+            order = self.orders[column]
+            if sort.startswith("-"):
+                # Reversed, but with the NaNs still last.
+                stop = len(order)
+                if column in self.sorted_values:
+                    stop = np.searchsorted(self.sorted_values[column], np.inf, "right")
+                order = np.concatenate([order[:stop][::-1], order[stop:]])
+        rows = order if mask is None else order[mask[order]]
+
+        fields = None
+        if args.get("fields"):
+            fields = [self.column(name) for name in args["fields"].split(",")]
+
+        offset = self._offset(args)
+        limit = self._integer(args, "limit", None)
+        # An empty page would hand back a cursor to itself.
+        if limit == 0:
+            raise QueryError('Invalid limit: "0", must be at least 1')
+        end = len(rows) if limit is None else offset + limit
+        return Page(
+            rows=rows[offset:end],
+            fields=fields,
+            total=len(rows),
+            offset=offset,
+            next_cursor=self._cursor(end) if end < len(rows) else None,
+        )
+
+    def _frame(self, page: Page) -> pd.DataFrame:
+        # Indexed like the whole snapshot, whatever fields were asked for.
+        frame = self.frame.iloc[page.rows]
+        if page.fields is not None:
+            fields = [name for name in page.fields if name not in self.index_names]
+            frame = frame[self.index_names + list(dict.fromkeys(fields))]
+        return frame.set_index(self.index_names)
+
+    def to_json(self, page: Page) -> str:
+        if page.fields is None and self.records:
+            return f"[{','.join(self.records[row] for row in page.rows)}]"
+        return dataframe_json(self._frame(page))
+
+    def to_html(self, page: Page) -> str:
+        return self._frame(page).to_html(classes="data", header=True)
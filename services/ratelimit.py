@@ -0,0 +1,58 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+
+@dataclass(slots=True)
+class TokenBucket:
+    rate: float
+    capacity: float = 1.0
+    _tokens: float = field(init=False, repr=False)
+    _updated_at: float = field(init=False, repr=False, default_factory=time.monotonic)
+    _lock: threading.Lock = field(
+        init=False, repr=False, default_factory=threading.Lock
+    )
+
+    def __post_init__(self) -> None:
+        self._tokens = self.capacity
+
+    def acquire(self) -> float:
+        # Returns the seconds spent waiting for a token.
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated_at) * self.rate
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+
+@dataclass(slots=True)
+class HostRateLimiter:
+    # Requests per second allowed for each host, bursts up to `burst` requests.
+    rate: float
+    burst: float = 1.0
+    _buckets: dict[str, TokenBucket] = field(
+        init=False, repr=False, default_factory=dict
+    )
+    _lock: threading.Lock = field(
+        init=False, repr=False, default_factory=threading.Lock
+    )
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return self._buckets[host]
+
+    def acquire(self, url: str) -> float:
+        return self.bucket(urlsplit(url).netloc).acquire()
@@ -0,0 +1,73 @@
+import json
+import os
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+ASSETS_DIR = "assets"
+
+
+def names_path(patch: str | None = None) -> str:
+    if patch is None:
+        return f"{ASSETS_DIR}/champions_names_by_id.json"
+    return f"{ASSETS_DIR}/patches/{patch}/champions_names_by_id.json"
+
+
+@dataclass(frozen=True, slots=True)
+class ChampionRegistry:
+    # None stands for whatever patch the top level assets currently hold.
+    patch: str | None
+    names_by_id: Mapping[str, str]
+    ids: tuple[int, ...]
+    names: tuple[str, ...]
+    # Champion ID -> position in `names`, usable as categorical codes.
+    codes: Mapping[int, int]
+
+    @classmethod
+    def from_mapping(
+        cls, names_by_id: dict[str, str], patch: str | None = None
+    ) -> "ChampionRegistry":
+        ids = tuple(int(champion_id) for champion_id in names_by_id)
+        return cls(
+            patch=patch,
+            names_by_id=MappingProxyType(dict(names_by_id)),
+            ids=ids,
+            names=tuple(names_by_id.values()),
+            codes=MappingProxyType(
+                {champion_id: i for i, champion_id in enumerate(ids)}
+            ),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, champion_id: int) -> bool:
+        return champion_id in self.codes
+
+
+_registries: dict[str | None, tuple[tuple[int, int], ChampionRegistry]] = {}
+_lock = threading.Lock()
+
+
+def get_registry(patch: str | None = None) -> ChampionRegistry:
+    path = names_path(patch)
+    # A stat is far cheaper than a parse, and notices assets rewritten on patch day.
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    with _lock:
+        cached = _registries.get(patch)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        with open(path) as f:
+            registry = ChampionRegistry.from_mapping(json.load(f), patch)
+        _registries[patch] = (signature, registry)
+
+    return registry
+
+
+def clear_registries() -> None:
+    with _lock:
+        _registries.clear()
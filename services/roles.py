@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def add_role_share(dataframe: pd.DataFrame) -> pd.DataFrame:
+    # Share of a champion's games played in each role. The totals are grouped
+    # on every index level but Role, so providers and sweep cells stay apart.
+    levels = [name for name in dataframe.index.names if name != "Role"]
+    games = dataframe["TotalGames"].to_numpy(dtype=np.float64)
+    totals = (
+        dataframe.groupby(level=levels, sort=False, observed=True)["TotalGames"]
+        .transform("sum")
+        .to_numpy(dtype=np.float64)
+    )
+    dataframe["RoleShare"] = np.round(
+        np.divide(
+            games, totals, out=np.zeros(len(games), dtype=np.float64), where=totals > 0
+        )
+        * 100,
+        2,
+    )
+
+    return dataframe
+
+
+def role_pivots(
+    dataframe: pd.DataFrame, values: tuple[str, ...] = ("RoleShare", "Winrate")
+) -> dict[str, pd.DataFrame]:
+    # One wide table per value: a row per champion, a column per role.
+    frame = dataframe.reset_index()
+    index = [
+        name
+        for name in (*dataframe.index.names, "ChampionName")
+        if name not in (None, "Role") and name in frame.columns
+    ]
+    frame["Role"] = frame["Role"].astype(str)
+
+    return {
+        value: frame.pivot_table(
+            index=index, columns="Role", values=value, aggfunc="first"
+        )
+        for value in values
+    }
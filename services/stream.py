@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import random
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable
+from urllib.parse import urlencode
+
+from colorama import Fore
+
+from .exporters import dataframe_json
+from .profiling import stage
+from .query import QueryError, SnapshotIndex, StaleCursor
+
+try:
+    import brotli
+except ImportError:  # Optional, gzip is always available.
+    brotli = None
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from flask import Flask, Request, Response
+
+
+def query_args(request: Request) -> list[tuple[str, str]]:
+    # The parameters that select something, cache busters such as "_" left out.
+    return [
+        (key, value)
+        for key, value in request.args.items(multi=True)
+        if not key.startswith("_")
+    ]
+
+
+@dataclass(frozen=True, slots=True)
+class RenderedPayload:
+    mimetype: str
+    etag: str
+    # Content-Encoding -> body, rendered and compressed once per snapshot.
+    variants: dict[str, bytes]
+
+    @classmethod
+    def from_text(cls, text: str, mimetype: str) -> RenderedPayload:
+        body = text.encode()
+        variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9)}
+        if brotli is not None:
+            variants["br"] = brotli.compress(body)
+
+        return cls(
+            mimetype=mimetype,
+            etag=hashlib.sha256(body).hexdigest()[:32],
+            variants=variants,
+        )
+
+    def negotiate(self, request: Request) -> str:
+        encodings = [
+            encoding for encoding in ("br", "gzip") if encoding in self.variants
+        ]
+        return request.accept_encodings.best_match(encodings) or "identity"
+
+    def respond(self, request: Request, response_class: type[Response]) -> Response:
+        encoding = self.negotiate(request)
+        response = response_class(
+            self.variants[encoding],
+            status=200,
+            mimetype=self.mimetype,
+            headers={"Vary": "Accept-Encoding", "Cache-Control": "no-cache"},
+        )
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        # Every encoding is its own representation, so it gets its own strong ETag.
+        response.set_etag(
+            self.etag if encoding == "identity" else f"{self.etag}-{encoding}"
+        )
+
+        return response.make_conditional(request)
+
+
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    dataframe: pd.DataFrame
+    html: RenderedPayload
+    json: RenderedPayload
+    index: SnapshotIndex
+
+    @classmethod
+    def from_dataframe(cls, dataframe: pd.DataFrame) -> Snapshot:
+        with stage("stream_render") as record:
+            json_payload = RenderedPayload.from_text(
+                dataframe_json(dataframe), "application/json"
+            )
+            snapshot = cls(
+                dataframe=dataframe,
+                html=RenderedPayload.from_text(
+                    dataframe.to_html(classes="data", header=True), "text/html"
+                ),
+                json=json_payload,
+                index=SnapshotIndex.from_dataframe(dataframe, json_payload.etag),
+            )
+            record.rows = len(dataframe)
+            record.bytes = sum(
+                len(body)
+                for payload in (snapshot.html, snapshot.json)
+                for body in payload.variants.values()
+            )
+
+        return snapshot
+
+    def query(
+        self, request: Request, response_class: type[Response], html: bool = False
+    ) -> Response:
+        # Same parameters, same snapshot, same answer: clients revalidate without a selection.
+        etag = hashlib.sha256(
+            f"{self.index.etag}?{sorted(query_args(request))}:{html}".encode()
+        ).hexdigest()[:32]
+        if request.if_none_match.contains(etag):
+            response = response_class(status=304)
+            response.set_etag(etag)
+            return response
+
+        try:
+            page = self.index.select(request.args)
+        except QueryError as e:
+            return response_class(
+                json.dumps({"error": str(e)}),
+                status=410 if isinstance(e, StaleCursor) else 400,
+                mimetype="application/json",
+            )
+
+        response = response_class(
+            self.index.to_html(page) if html else self.index.to_json(page),
+            status=200,
+            mimetype="text/html" if html else "application/json",
+            headers={
+                "Cache-Control": "no-cache",
+                "X-Total-Count": str(page.total),
+                "X-Offset": str(page.offset),
+            },
+        )
+        if page.next_cursor is not None:
+            args = request.args.copy()
+            args.pop("offset", None)
+            args["cursor"] = page.next_cursor
+            response.headers[
+                "Link"
+            ] = f'<{request.base_url}?{urlencode(list(args.items(multi=True)))}>; rel="next"'
+        response.set_etag(etag)
+        return response
+
+
+@dataclass(slots=True)
+class SnapshotStore:
+    # Replaced as a whole, never mutated, so a reader always sees one complete snapshot.
+    current: Snapshot
+
+
+@dataclass(slots=True)
+class SnapshotRefresher:
+    store: SnapshotStore
+    load: Callable[[], pd.DataFrame]
+    interval: float
+    # Fraction of the interval added or removed at random, so workers don't sync up.
+    jitter: float = 0.1
+    _stop: threading.Event = field(
+        init=False, repr=False, default_factory=threading.Event
+    )
+    _thread: threading.Thread | None = field(init=False, repr=False, default=None)
+
+    def next_delay(self) -> float:
+        return max(0.0, self.interval * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def refresh(self) -> bool:
+        try:
+            snapshot = Snapshot.from_dataframe(self.load())
+        except Exception as e:
+            print(
+                f"\N{warning sign} {Fore.LIGHTRED_EX}Refresh failed, keeping the last snapshot: {e}"
+            )
+            return False
+
+        self.store.current = snapshot
+        print(f"\N{clockwise open circle arrow} {Fore.LIGHTGREEN_EX}Data refreshed.")
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.next_delay()):
+            self.refresh()
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="snapshot-refresher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def create_app(source: Snapshot | SnapshotStore) -> Flask:
+    from flask import Flask, request
+
+    store = source if isinstance(source, SnapshotStore) else SnapshotStore(source)
+    app = Flask(__name__)
+
+    # Without query parameters the whole snapshot is served, pre-rendered.
+    @app.route("/", methods=["GET"])
+    def render_table():
+        snapshot = store.current
+        if query_args(request):
+            return snapshot.query(request, app.response_class, html=True)
+        return snapshot.html.respond(request, app.response_class)
+
+    @app.route("/json", methods=["GET"])
+    def rend_json():
+        snapshot = store.current
+        if query_args(request):
+            return snapshot.query(request, app.response_class)
+        return snapshot.json.respond(request, app.response_class)
+
+    return app
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import itertools
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Iterator
+
+from colorama import Fore
+
+from .cache import ResponseCache
+from .profiling import stage
+from .ratelimit import HostRateLimiter
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from .columns import ChampionColumns
+    from .utils import BaseAPIService
+
+DIMENSIONS = ("tier", "position", "period", "region", "queue")
+
+
+def parse_grid(specs: list[str]) -> dict[str, list[str]]:
+    grid: dict[str, list[str]] = {}
+    for spec in specs:
+        dimension, separator, values = spec.partition("=")
+        dimension = dimension.strip().lower()
+        if not separator or dimension not in DIMENSIONS:
+            raise ValueError(
+                f'Invalid sweep: "{spec}", expected DIMENSION=VALUE[,VALUE...] with a dimension of {{{", ".join(DIMENSIONS)}}}'
+            )
+        grid.setdefault(dimension, []).extend(
+            value.strip() for value in values.split(",")
+        )
+
+    return grid
+
+
+def expand_grid(
+    service_class: type[BaseAPIService], grid: dict[str, list[str]]
+) -> list[dict[str, str]]:
+    # Dimensions a provider doesn't support keep its default instead of multiplying jobs.
+    dimensions = [
+        dimension for dimension in service_class.dimensions if dimension in grid
+    ]
+    return [
+        dict(zip(dimensions, values))
+        for values in itertools.product(
+            *(dict.fromkeys(grid[dimension]) for dimension in dimensions)
+        )
+    ]
+
+
+def iter_sweep(
+    service_classes: dict[str, type[BaseAPIService]],
+    grid: dict[str, list[str]],
+    max_workers: int = 4,
+    rate: float = 2.0,
+    **options,
+) -> Iterator[pd.DataFrame]:
+    from .transport import create_session
+
+    per_role = options.get("per_role", False)
+    # Every job shares the same pool, cache, champions registry and per-host limits,
+    # with a connection for each request a worker's job has in flight.
+    fan_out = max(
+        service_class.fan_out(per_role) for service_class in service_classes.values()
+    )
+    options.setdefault(
+        "session",
+        create_session(
+            pool_size=max_workers * fan_out, rate_limiter=HostRateLimiter(rate)
+        ),
+    )
+    options.setdefault("cache", ResponseCache())
+    jobs = [
+        service_class(**params, **options)
+        for service_class in service_classes.values()
+        for params in expand_grid(service_class, grid)
+    ]
+    print(
+        f"\N{spiral calendar pad} {Fore.LIGHTCYAN_EX}Sweeping {len(jobs)} combinations with {max_workers} workers..."
+    )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(job.get_stats): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            dimensions = job.get_dimensions()
+            try:
+                data = future.result()
+            except Exception as e:
+                print(
+                    f"\N{warning sign} {Fore.LIGHTRED_EX}Skipping {job.provider} {dimensions}: {e}{Fore.RESET}"
+                )
+                continue
+
+            yield cell_frame(data, dimensions, per_role)
+
+
+def cell_frame(
+    data: ChampionColumns, dimensions: dict[str, str], per_role: bool = False
+) -> pd.DataFrame:
+    frame = data.unique(per_role).to_dataframe()
+    for dimension in DIMENSIONS:
+        frame[dimension.title()] = (dimensions.get(dimension) or "-").lower()
+    return frame
+
+
+def sweep(
+    service_classes: dict[str, type[BaseAPIService]],
+    grid: dict[str, list[str]],
+    **options,
+) -> pd.DataFrame:
+    frames = list(iter_sweep(service_classes, grid, **options))
+    if not frames:
+        raise ValueError("None of the sweep combinations returned data.")
+
+    return combine(frames, options.get("per_role", False))
+
+
+def combine(frames: list[pd.DataFrame], per_role: bool = False) -> pd.DataFrame:
+    import pandas as pd
+
+    from .roles import add_role_share
+
+    with stage("dataframe", provider="sweep") as record:
+        df = pd.concat(frames, ignore_index=True)
+        df.sort_values("Winrate", ascending=False, inplace=True)
+        df.set_index(
+            [
+                "ChampionId",
+                *(["Role"] if per_role else []),
+                "Provider",
+                *(dimension.title() for dimension in DIMENSIONS),
+            ],
+            inplace=True,
+        )
+        if per_role:
+            add_role_share(df)
+        record.rows = len(df)
+
+    return df
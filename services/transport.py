@@ -0,0 +1,110 @@
+import random
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError
+from urllib3.util.retry import Retry
+
+from .ratelimit import HostRateLimiter
+
+# (connect, read) seconds, used when a caller doesn't pass its own timeout.
+DEFAULT_TIMEOUT = (5.0, 30.0)
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Shared by every session that doesn't bring its own limiter, so all providers
+# and the assets updater stay under the same per-host budget.
+default_rate_limiter = HostRateLimiter(rate=5.0, burst=5.0)
+
+
+class JitteredRetry(Retry):
+    def get_backoff_time(self) -> float:
+        # Full jitter keeps concurrent workers from retrying in lockstep,
+        # a Retry-After header still takes precedence over this.
+        backoff = super().get_backoff_time()
+        return random.uniform(backoff / 2, backoff) if backoff else 0.0
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    # Retries are run here rather than inside urllib3, so every attempt, retries
+    # included, waits for its host's rate limiter.
+    def __init__(
+        self,
+        retry: Retry,
+        rate_limiter: HostRateLimiter | None = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(max_retries=0, **kwargs)
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+
+    def send(self, request: requests.PreparedRequest, *args, **kwargs):
+        retry = self.retry
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(request.url)
+
+            try:
+                response = super().send(request, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                try:
+                    retry = retry.increment(request.method, request.url, error=e)
+                except MaxRetryError:
+                    raise e
+                retry.sleep()
+                continue
+
+            if not retry.is_retry(
+                request.method,
+                response.status_code,
+                "Retry-After" in response.headers,
+            ):
+                return response
+            try:
+                retry = retry.increment(
+                    request.method, request.url, response=response.raw
+                )
+            except MaxRetryError:
+                # Hand the last response back, callers report the status.
+                return response
+
+            response.raw.drain_conn()
+            response.close()
+            retry.sleep(response.raw)
+
+
+class TransportSession(requests.Session):
+    def __init__(self, timeout: float | tuple[float, float] = DEFAULT_TIMEOUT) -> None:
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method: str, url: str, *args, **kwargs) -> requests.Response:
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+
+        return super().request(method, url, *args, **kwargs)
+
+
+def create_session(
+    pool_size: int = 10,
+    retries: int = 3,
+    backoff_factor: float = 0.5,
+    timeout: float | tuple[float, float] = DEFAULT_TIMEOUT,
+    rate_limiter: HostRateLimiter | None = default_rate_limiter,
+) -> TransportSession:
+    session = TransportSession(timeout=timeout)
+    retry = JitteredRetry(
+        total=retries,
+        status_forcelist=RETRY_STATUSES,
+        backoff_factor=backoff_factor,
+        respect_retry_after_header=True,
+    )
+    adapter = RateLimitedAdapter(
+        retry,
+        rate_limiter,
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
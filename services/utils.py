@@ -1,12 +1,23 @@
 import json
 import os
+from array import array
 from dataclasses import dataclass, field
-from typing import TypedDict
+from typing import ClassVar, Iterator, Mapping, TypedDict
 
-import inflect
+import numpy as np
+import pandas as pd
 import requests
 from colorama import Fore
 
+from .assets import sync as sync_assets
+from .assets import versions_due
+from .cache import ResponseCache
+from .columns import ChampionColumns, names_dtype
+from .jsonstream import collect_columns, iter_array
+from .profiling import stage
+from .registry import ChampionRegistry, get_registry, names_path
+from .transport import create_session
+
 
 class Providers:
     OP_GG = "OP.GG"
@@ -19,6 +30,20 @@ class Providers:
         BLITZ_GG: "https://league-champion-aggregate.iesdev.com/graphql",
     }
 
+    # Seconds to wait for each provider before giving up on it.
+    timeouts: dict[str, float] = {
+        OP_GG: 15.0,
+        BLITZ_GG: 30.0,
+    }
+
+
+def role_name(role: str) -> str:
+    return role.upper() if "adc" in role.lower() else role.title()
+
+
+# Bytes read from the socket at a time when streaming a response.
+STREAM_CHUNK_SIZE = 64 * 1024
+
 
 class ChampionsData(TypedDict):
     ChampionId: list[int]
@@ -27,15 +52,28 @@ class ChampionsData(TypedDict):
     TotalGames: list[int]
     Wins: list[int]
     Losses: list[int]
-    Winrate: list[str | float]
-    Provider: list[Providers] | Providers
+    Winrate: list[float]
+    Provider: list[str]
 
 
 @dataclass(slots=True)
 class BaseAPIService:
+    provider: ClassVar[str | None] = None
+    # Request parameters a sweep can vary, declared as fields by each provider.
+    dimensions: ClassVar[tuple[str, ...]] = ()
+    # Where the champion records sit in the response, and their field names.
+    records_path: ClassVar[tuple[str, ...]] = ()
+    record_keys: ClassVar[dict[str, str]] = {}
+
     session: requests.sessions.Session = field(
-        repr=False, default_factory=requests.session
+        repr=False, default_factory=create_session
     )
+    timeout: float | None = None
+    cache: ResponseCache | None = field(repr=False, default_factory=ResponseCache)
+    offline: bool = False
+    stream: bool = False
+    # Every role a champion is played in instead of only its most popular one.
+    per_role: bool = False
     headers: dict[str, str] = field(
         default_factory=lambda: {
             "User-Agent": "Mozilla/5.0 (Windows NT 5.2; en-US; rv:1.9.0.20) Gecko/20140108 Firefox/37.0",
@@ -44,153 +82,314 @@ class BaseAPIService:
     )
     params: dict = field(default_factory=dict)
     response_data: dict = field(repr=False, default_factory=dict)
-    champions_names: dict[str, str] = field(default_factory=dict)
-    champions_data: ChampionsData = field(
-        repr=False,
-        default_factory=lambda: {
-            "ChampionId": [],
-            "ChampionName": [],
-            "Role": [],
-            "TotalGames": [],
-            "Wins": [],
-            "Losses": [],
-            "Winrate": [],
-            "Provider": [],
-        },
-    )
+    # Columns filled while streaming, used instead of response_data.
+    records: dict[str, array | list] | None = field(repr=False, default=None)
+    patch: str | None = None
+    champions_names: Mapping[str, str] = field(default_factory=dict)
+    registry: ChampionRegistry | None = field(init=False, repr=False, default=None)
+    # Typed columns of the sanitized data, see services.columns.
+    columns: ChampionColumns | None = field(init=False, repr=False, default=None)
+    # Unknown champions trigger a single forced assets sync per instance.
+    assets_resynced: bool = field(init=False, repr=False, default=False)
 
     def __post_init__(self) -> None:
         print(f"\N{atom symbol} {Fore.LIGHTBLUE_EX}{self.__class__.__name__}")
+        if self.timeout is None:
+            self.timeout = Providers.timeouts.get(self.provider)
         self.set_champions_names()
 
     def __str__(self) -> str:
         return f"{self.__class__.__name__} - {self.__dict__}"
 
     def __len__(self) -> int:
-        return len(self.champions_data["ChampionId"])
+        return len(self.columns) if self.columns is not None else 0
 
     def __contains__(self, item: int) -> bool:
-        return item in self.champions_data["ChampionId"]
+        return self.columns is not None and bool(
+            (self.columns.champion_id == item).any()
+        )
+
+    @property
+    def champions_data(self) -> ChampionsData:
+        # Plain lists, built on demand from the typed columns.
+        return self.columns.to_dict() if self.columns is not None else {}
+
+    def get_dimensions(self) -> dict[str, str]:
+        return {dimension: getattr(self, dimension) for dimension in self.dimensions}
+
+    @classmethod
+    def fan_out(cls, per_role: bool = False) -> int:
+        # Requests one call has in flight to the provider's host at the same time.
+        return 1
 
-    def set_champions_names(self) -> dict[str, str]:
+    def set_champions_names(self) -> Mapping[str, str]:
         try:
-            if not os.path.exists("assets/champions_names_by_id.json"):
-                self.update_champions_assets()
-            with open("assets/champions_names_by_id.json") as f:
-                data = json.load(f)
+            if not os.path.exists(names_path(self.patch)):
+                self.update_champions_assets(self.patch)
+            elif self.patch is None and not self.offline and versions_due():
+                # Unpinned runs follow the latest patch, checked once per VERSIONS_TTL.
+                try:
+                    self.update_champions_assets()
+                except Exception as e:
+                    print(
+                        f"{Fore.LIGHTYELLOW_EX}\t\N{warning sign} Keeping the current champions assets: {e}"
+                    )
+            # Loaded once per process and patch, shared by every provider instance.
+            self.registry = get_registry(self.patch)
         except FileNotFoundError as e:
             raise FileNotFoundError(
                 "Something went wrong while trying to load the champions names."
             ) from e
 
-        self.champions_names = data
+        self.champions_names = self.registry.names_by_id
+        return self.champions_names
 
-    def calculate_winrate_percentage(
-        self, format_type: type, wins: int, games: int, loses: int = 0
-    ) -> str | float:
-        percentage = round(
-            wins / (wins + loses) * 100 if loses else wins / games * 100, 2
+    def _request(
+        self, key: str, url: str, params: dict | str, stream: bool = False
+    ) -> tuple[str, bytes | requests.Response]:
+        # The cached body when it can be used, the validated response otherwise.
+        entry = self.cache.get(key) if self.cache else None
+
+        if self.offline:
+            if entry is None:
+                raise FileNotFoundError(
+                    f"No cached response for {self.provider}, run once without --offline first."
+                )
+            print(
+                f"\t{Fore.LIGHTYELLOW_EX}\N{floppy disk} Replaying the cached {self.provider} response."
+            )
+            return "offline", entry.body
+
+        if entry is not None and self.cache.is_fresh(entry):
+            print(
+                f"\t{Fore.LIGHTGREEN_EX}\N{floppy disk} Using the cached {self.provider} response."
+            )
+            return "cache", entry.body
+
+        headers = dict(self.headers)
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        response: requests.Response = self.session.get(
+            url, headers=headers, params=params, timeout=self.timeout, stream=stream
         )
 
-        return f"{percentage}%" if format_type == str else percentage
+        if entry is not None and response.status_code == 304:
+            # Streamed responses hold their connection until closed.
+            response.close()
+            self.cache.touch(key)
+            return "revalidated", entry.body
 
-    def complete_missing_champions_data(self, winrate_type: type) -> None:
         print(
-            f"{Fore.LIGHTCYAN_EX}\t\N{black question mark ornament} Checking for missing champions."
+            f"\t\N{black question mark ornament}{Fore.LIGHTCYAN_EX} Checking for the response validation..."
         )
-        missing_champs = []
-
-        for champion_id, champion_name in self.champions_names.items():
-            if (
-                int(champion_id) not in self.champions_data["ChampionId"]
-                or champion_name not in self.champions_data["ChampionName"]
-            ):
-                self.champions_data["ChampionId"].append(champion_id)
-                self.champions_data["ChampionName"].append(champion_name)
-                self.champions_data["Role"].append("-")
-                self.champions_data["TotalGames"].append(0)
-                self.champions_data["Wins"].append(0)
-                self.champions_data["Losses"].append(0)
-                self.champions_data["Winrate"].append(
-                    "0%" if winrate_type == str else 0.0
-                )
-                missing_champs.append(champion_name)
-
-        assert len(self.champions_data["ChampionId"]) >= len(
-            self.champions_names
-        ), f"Champions IDs must be equal or greater than {len(self.champions_names)}"
-        assert len(self.champions_data["ChampionName"]) >= len(
-            self.champions_names
-        ), f"Champions names must be equal or greater than {len(self.champions_names)}"
-
-        assert (
-            len(self.champions_data["ChampionId"])
-            == len(self.champions_data["ChampionName"])
-            == len(self.champions_data["TotalGames"])
-            == len(self.champions_data["Wins"])
-            == len(self.champions_data["Losses"])
-            == len(self.champions_data["Winrate"])
-        ), "Champions data length doesn't match"
-
-        if missing_champs:
-            p = inflect.engine()
-            print(
-                f"{Fore.LIGHTCYAN_EX}\t\t\N{information source} Added {len(missing_champs)} missing champions: {p.join(missing_champs, final_sep='')}"
+        if not response:
+            response.close()
+            raise requests.HTTPError(
+                f"Could not fetch the data from {self.provider}: {response.status_code} {response.reason}",
+                response=response,
             )
-        else:
+
+        return "network", response
+
+    def _fetch_json(self, url: str, params: dict | str) -> dict:
+        with stage("fetch", provider=self.provider) as record:
+            key = ResponseCache.key(self.provider, url, params)
+            source, result = self._request(key, url, params)
+            record.attrs["source"] = source
+            if source != "network":
+                record.bytes = len(result)
+                return json.loads(result)
+
+            data = result.json()
+            record.bytes = len(result.content)
             print(
-                f"{Fore.LIGHTGREEN_EX}\t\t\N{check mark} No missing champions were found."
+                f"\t\t{Fore.LIGHTGREEN_EX}\N{check mark} Response code and data are valid!"
             )
+            if self.cache is not None:
+                self.cache.put(
+                    key,
+                    result.content,
+                    result.headers.get("ETag"),
+                    result.headers.get("Last-Modified"),
+                )
 
-    def update_champions_assets(self, patch: str = None) -> None:
-        try:
-            if not patch:
-                print(
-                    f"{Fore.LIGHTBLUE_EX}\t\N{information source} No patch specified."
+            return data
+
+    def _fetch_records(self, url: str, params: dict | str) -> dict[str, array | list]:
+        # Streaming ingestion: the body is parsed as it arrives and every record
+        # goes straight into its columns, the response tree is never built.
+        with stage("fetch", provider=self.provider, stream=True) as record:
+            key = ResponseCache.key(self.provider, url, params)
+            source, result = self._request(key, url, params, stream=True)
+            record.attrs["source"] = source
+            if source == "network":
+                chunks = result.iter_content(STREAM_CHUNK_SIZE)
+                if self.cache is not None:
+                    chunks = self.cache.put_chunks(
+                        key,
+                        chunks,
+                        result.headers.get("ETag"),
+                        result.headers.get("Last-Modified"),
+                    )
+            else:
+                chunks = iter((result,))
+
+            record.bytes = 0
+
+            def counted() -> Iterator[bytes]:
+                for chunk in chunks:
+                    record.bytes += len(chunk)
+                    yield chunk
+
+            body = counted()
+            keys = self.record_keys
+            try:
+                columns = collect_columns(
+                    iter_array(body, self.records_path),
+                    int_keys=(keys["id_key"], keys["games_key"], keys["wins_key"]),
+                    keys=(keys["role_key"],) if "role_key" in keys else (),
                 )
+                # The rest of the body still goes through, the cache keeps it whole.
+                for _ in body:
+                    pass
+            finally:
+                if source == "network":
+                    # Also on a parse error: the partial cache entry is dropped
+                    # and the connection is released.
+                    chunks.close()
+                    result.close()
+            record.rows = len(columns[keys["id_key"]])
+            if source == "network":
                 print(
-                    f"{Fore.LIGHTYELLOW_EX}\t\t\N{telephone receiver} Calling for the latest patch..."
+                    f"\t\t{Fore.LIGHTGREEN_EX}\N{check mark} Response code and data are valid!"
                 )
-                patch_res: requests.Response = self.session.get(
-                    "https://utils.iesdev.com/static/json/lol/riot/versions",
-                    headers=self.headers,
+
+            return columns
+
+    def _sanitize_records(
+        self,
+        records: list[dict] | Mapping[str, array | list],
+        id_key: str,
+        games_key: str,
+        wins_key: str,
+        role_key: str | None = None,
+        role: str | None = None,
+    ) -> None:
+        with stage("sanitize", provider=self.provider) as record:
+            columns = [id_key, games_key, wins_key] + ([role_key] if role_key else [])
+            if isinstance(records, Mapping):
+                # Streamed columns, the packed integers are wrapped, not copied.
+                frame = pd.DataFrame(
+                    {
+                        column: np.frombuffer(records[column], dtype=np.int64)
+                        if isinstance(records[column], array)
+                        else records[column]
+                        for column in columns
+                    }
                 )
-                patch: str = patch_res.json()[0]
+            else:
+                frame = pd.DataFrame.from_records(records, columns=columns)
+            record.rows = len(frame)
 
-            print(f"{Fore.LIGHTGREEN_EX}\t\t\t\N{check mark} Using patch {patch}")
-            response: requests.Response = self.session.get(
-                f"https://ddragon.leagueoflegends.com/cdn/{patch}/data/en_US/champion.json"
-            )
+            ids = frame[id_key].to_numpy(dtype=np.int64)
+            games = frame[games_key].to_numpy(dtype=np.int64)
+            wins = frame[wins_key].to_numpy(dtype=np.int64)
 
-            if not response:
-                raise requests.HTTPError(
-                    "Couldn't fetch the champions data from Data Dragon, make sure that the provided patch is valid."
+            codes = pd.Series(ids).map(self.registry.codes)
+            if codes.isna().any() and not self.offline and not self.assets_resynced:
+                # Most likely a champion released since the last sync, resynced once.
+                print(
+                    f"{Fore.LIGHTYELLOW_EX}\t\N{warning sign} Unknown champions IDs, updating the champions assets..."
+                )
+                self.assets_resynced = True
+                self.update_champions_assets(self.patch, force=True)
+                self.registry = get_registry(self.patch)
+                self.champions_names = self.registry.names_by_id
+                codes = pd.Series(ids).map(self.registry.codes)
+            if codes.isna().any():
+                unknown = ids[codes.isna().to_numpy()].tolist()
+                raise KeyError(
+                    f"Unknown champions IDs {unknown}, try updating the champions assets."
                 )
 
-            res_data: dict = response.json()
-            assert (
-                "data" in res_data
-            ), "Couldn't fetch the champions data from Data Dragon, make sure that the provided patch is valid."
+            if role_key:
+                lowered = frame[role_key].str.lower()
+                roles = pd.Categorical(
+                    np.where(
+                        lowered.str.contains("adc"),
+                        frame[role_key].str.upper(),
+                        frame[role_key].str.title(),
+                    )
+                )
+            else:
+                # Records fetched for a single role all get that role.
+                roles = pd.Categorical.from_codes(
+                    np.zeros(len(frame), dtype=np.int8),
+                    categories=[role_name(role) if role else "-"],
+                )
 
-            print(
-                f"{Fore.LIGHTYELLOW_EX}\t\N{hourglass} Writing champions data to champions.json"
+            self.columns = ChampionColumns.from_arrays(
+                champion_id=ids,
+                champion_name=pd.Categorical.from_codes(
+                    codes.to_numpy(dtype=np.int64),
+                    dtype=names_dtype(self.registry.names),
+                ),
+                role=roles,
+                total_games=games,
+                wins=wins,
+                provider=self.provider,
             )
-            with open("assets/champions.json", "w") as f:
-                json.dump(res_data, f)
 
-            champs_names_by_id = {
-                value["key"]: value["name"] for value in res_data["data"].values()
-            }
-
-            assert len(res_data["data"].keys()) == len(
-                champs_names_by_id.keys()
-            ), f"{Fore.RED}Keys are not equal"
+    def complete_missing_champions_data(self) -> None:
+        with stage("complete_missing", provider=self.provider) as record:
             print(
-                f"{Fore.LIGHTYELLOW_EX}\t\N{hourglass} Writing mapped data to champions_names_by_id.json"
+                f"{Fore.LIGHTCYAN_EX}\t\N{black question mark ornament} Checking for missing champions."
             )
-            with open("assets/champions_names_by_id.json", "w") as f:
-                json.dump(champs_names_by_id, f)
+            registry_ids = np.fromiter(self.registry.ids, dtype=np.int64)
+            positions = np.flatnonzero(~np.isin(registry_ids, self.columns.champion_id))
+            missing_champs = [self.registry.names[i] for i in positions]
+
+            record.rows = len(positions)
+            if len(positions):
+                count = len(positions)
+                self.columns = self.columns.concat(
+                    ChampionColumns.from_arrays(
+                        champion_id=registry_ids[positions],
+                        champion_name=pd.Categorical.from_codes(
+                            positions, dtype=names_dtype(self.registry.names)
+                        ),
+                        role=pd.Categorical.from_codes(
+                            np.zeros(count, dtype=np.int8), categories=["-"]
+                        ),
+                        total_games=np.zeros(count, dtype=np.int64),
+                        wins=np.zeros(count, dtype=np.int64),
+                        provider=self.provider,
+                    )
+                )
+
+            assert len(self.columns) >= len(
+                self.registry
+            ), f"Champions IDs must be equal or greater than {len(self.registry)}"
+
+            if missing_champs:
+                import inflect
 
+                p = inflect.engine()
+                print(
+                    f"{Fore.LIGHTCYAN_EX}\t\t\N{information source} Added {len(missing_champs)} missing champions: {p.join(missing_champs, final_sep='')}"
+                )
+            else:
+                print(
+                    f"{Fore.LIGHTGREEN_EX}\t\t\N{check mark} No missing champions were found."
+                )
+
+    def update_champions_assets(self, patch: str = None, force: bool = False) -> None:
+        try:
+            sync_assets(patch, self.session, self.headers, self.timeout, force)
             print(
                 f"{Fore.LIGHTGREEN_EX}\t\N{check mark} Updated champions assets successfully."
             )
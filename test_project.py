@@ -1,14 +1,36 @@
 import argparse
+import gzip
+import importlib.util
 import os
+import sqlite3
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 import pytest
 
-from project import export_to, get_args, get_data_as_dataframe, plot_data
+from project import (
+    PROVIDERS,
+    _combined_dataframe,
+    export_changed,
+    export_to,
+    export_to_many,
+    get_args,
+    get_data_as_dataframe,
+    get_provider_class,
+    plot_data,
+    plot_data_many,
+)
+from services import profiling
+from services.analysis import consensus
+from services.archive import Archive
+from services.columns import ChampionColumns, names_dtype
+from services.jsonstream import collect_columns, iter_array
+from services.roles import add_role_share, role_pivots
+from services.stream import Snapshot, create_app
 
 
-def test_get_args():
+def test_get_args(monkeypatch):
     test1_args = ["op.gg", "-t", "xlsx", "--plot"]
     test1 = get_args(test1_args)
     assert type(test1) == argparse.Namespace
@@ -78,6 +100,115 @@ def test_get_args():
     assert "Invalid provider:" in str(test10.value)
     assert test10_args[0] in str(test10.value)
 
+    test9_args = ["all", "-t", "csv"]
+    test9 = get_args(test9_args)
+    assert type(test9) == argparse.Namespace
+    assert test9.provider == "all"
+    assert test9.type == "csv"
+
+    test12_args = ["op.gg", "-t", "csv", "--offline", "--cache-ttl", "60"]
+    test12 = get_args(test12_args)
+    assert test12.offline is True
+    assert test12.cache_ttl == 60.0
+
+    test13 = get_args(["op.gg", "--stream", "--refresh", "300"])
+    assert test13.stream is True
+    assert test13.refresh == 300.0
+
+    with pytest.raises(argparse.ArgumentError) as test14:
+        get_args(["op.gg", "--stream", "--refresh", "-1"])
+    assert "Invalid refresh interval" in str(test14.value)
+
+    with pytest.raises(argparse.ArgumentError) as test23:
+        get_args(["op.gg", "-t", "csv", "--refresh", "300"])
+    assert "add --stream" in str(test23.value)
+
+    with pytest.raises(argparse.ArgumentError) as test24:
+        get_args(["op.gg", "--stream", "--offline", "--refresh", "300"])
+    assert "needs a network run" in str(test24.value)
+
+    test15 = get_args(
+        ["all", "-t", "csv", "--sweep", "tier=platinum_plus,diamond_plus"]
+        + ["--sweep", "position=top"]
+    )
+    assert test15.sweep == {
+        "tier": ["platinum_plus", "diamond_plus"],
+        "position": ["top"],
+    }
+
+    with pytest.raises(argparse.ArgumentError) as test16:
+        get_args(["op.gg", "-t", "csv", "--sweep", "season=12"])
+    assert "Invalid sweep" in str(test16.value)
+
+    test17 = get_args(["op.gg", "-t", "csv,parquet,ndjson"])
+    assert test17.type == "csv,parquet,ndjson"
+
+    with monkeypatch.context() as patched:
+        patched.setattr(importlib.util, "find_spec", lambda name: None)
+        with pytest.raises(argparse.ArgumentError) as test28:
+            get_args(["op.gg", "-t", "csv,parquet"])
+    assert 'needs the pyarrow package: "pip3 install pyarrow"' in str(test28.value)
+
+    with pytest.raises(argparse.ArgumentError) as test18:
+        get_args(["op.gg", "-t", "csv,yaml"])
+    assert 'Invalid type: "yaml"' in str(test18.value)
+
+    test19 = get_args(["op.gg", "-t", "csv", "--trace-out", "trace.json"])
+    assert test19.trace_out == "trace.json"
+    assert test19.profile is None
+
+    test20 = get_args(["all", "-t", "csv", "--per-role"])
+    assert test20.per_role is True
+
+    test22 = get_args(["op.gg", "-t", "csv", "--skip-unchanged", "--delta"])
+    assert test22.skip_unchanged is True
+    assert test22.delta is True
+
+    with pytest.raises(argparse.ArgumentError) as test25:
+        get_args(["op.gg", "--archive", "--sweep", "tier=platinum_plus,diamond_plus"])
+    assert "Sweeps can not be archived" in str(test25.value)
+
+    with pytest.raises(argparse.ArgumentError) as test29:
+        get_args(["op.gg", "-t", "csv", "--per-role", "--sweep", "position=top,mid"])
+    assert "can not be combined with --per-role" in str(test29.value)
+    # The connection pools make room for the five positions fetched side by side.
+    assert get_provider_class("op.gg").fan_out(per_role=True) == 5
+    assert get_provider_class("blitz.gg").fan_out(per_role=True) == 1
+
+    with pytest.raises(argparse.ArgumentError) as test30:
+        get_args(["op.gg", "--plot", "--plot-dpi", "0"])
+    assert 'Invalid plot DPI: "0"' in str(test30.value)
+
+    with pytest.raises(argparse.ArgumentError) as test31:
+        get_args(["op.gg", "--plot", "--plot-top", "-3"])
+    assert 'Invalid plot top: "-3"' in str(test31.value)
+
+    with pytest.raises(argparse.ArgumentError) as test32:
+        get_args(["op.gg", "--plot", "--plot-by", "role"])
+    assert 'Invalid plot column: "role"' in str(test32.value)
+
+    # Some columns only exist for per-role or sweep data.
+    with pytest.raises(argparse.ArgumentError) as test33:
+        get_args(["op.gg", "-t", "xlsx", "--sheet-by", "RoleShare"])
+    assert 'Invalid sheet column: "RoleShare"' in str(test33.value)
+    test34 = get_args(
+        ["op.gg", "--plot", "--plot-by", "Tier", "--sweep", "tier=gold,platinum"]
+    )
+    assert test34.plot_by == "Tier"
+    assert get_args(["all", "--plot", "--plot-by", "Role", "--plot-top", "10"])
+
+    with pytest.raises(argparse.ArgumentError) as test26:
+        get_args(["op.gg", "-t", "csv", "--workers", "0"])
+    assert 'Invalid workers: "0"' in str(test26.value)
+
+    with pytest.raises(argparse.ArgumentError) as test27:
+        get_args(["op.gg", "-t", "csv", "--rate-limit", "0"])
+    assert 'Invalid rate limit: "0.0"' in str(test27.value)
+
+    with pytest.raises(argparse.ArgumentError) as test21:
+        get_args(["-t", "csv"])
+    assert "Missing provider" in str(test21.value)
+
     test11_args = ["stats.cs50p.gg", "-t", "csv"]
     with pytest.raises(argparse.ArgumentError) as test11:
         get_args(test11_args)
@@ -129,6 +260,13 @@ def test_get_data_as_dataframe():
     for test2_role in ("Top", "Jungle", "Mid", "ADC", "Support"):
         assert test2_role in test2_champs_roles
 
+    test4 = get_data_as_dataframe("all")
+    assert type(test4) == pd.DataFrame
+    assert test4.index.names == ["ChampionId", "Provider"]
+    assert test4.loc[(1, "OP.GG"), "ChampionName"] == "Annie"
+    assert test4.loc[(1, "BLITZ.GG"), "ChampionName"] == "Annie"
+    assert test4.index.is_unique
+
     with pytest.raises(ValueError) as test3:
         get_data_as_dataframe("invalid")
     assert test3.type == ValueError
@@ -225,3 +363,909 @@ def test_plot_data():
     assert os.path.isfile(test2) == True
     assert os.path.exists(test2) == True
     assert os.path.splitext(test2)[1][1:] == file_type
+
+
+def test_stream_snapshot():
+    dataframe = pd.DataFrame(
+        {"ChampionName": ["Annie", "Jhin"], "Winrate": [51.2, 49.0]},
+        index=pd.Index([1, 202], name="ChampionId"),
+    )
+    client = create_app(Snapshot.from_dataframe(dataframe)).test_client()
+
+    test1 = client.get("/json")
+    assert test1.status_code == 200
+    assert test1.json["ChampionName"]["202"] == "Jhin"
+    assert test1.headers["ETag"]
+
+    test2 = client.get("/json", headers={"If-None-Match": test1.headers["ETag"]})
+    assert test2.status_code == 304
+    assert test2.data == b""
+
+    test3 = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert test3.status_code == 200
+    assert test3.headers["Content-Encoding"] == "gzip"
+    assert b"Annie" in gzip.decompress(test3.data)
+    assert test3.headers["ETag"] != test1.headers["ETag"]
+
+
+def test_stream_refresh():
+    from services.stream import SnapshotRefresher, SnapshotStore
+
+    dataframe = pd.DataFrame(
+        {"ChampionName": ["Annie", "Jhin"], "Winrate": [51.2, 49.0]},
+        index=pd.Index([1, 202], name="ChampionId"),
+    )
+    store = SnapshotStore(Snapshot.from_dataframe(dataframe))
+    client = create_app(store).test_client()
+    test1 = client.get("/json")
+
+    refreshed = dataframe.assign(Winrate=[51.2, 50.5])
+    refresher = SnapshotRefresher(store, lambda: refreshed, interval=60)
+    first = store.current
+    assert refresher.refresh() is True
+    assert store.current is not first
+
+    test2 = client.get("/json", headers={"If-None-Match": test1.headers["ETag"]})
+    assert test2.status_code == 200
+    assert test2.headers["ETag"] != test1.headers["ETag"]
+    assert test2.json["Winrate"]["202"] == 50.5
+
+    # A failed load keeps serving the last snapshot.
+    def failing_load():
+        raise ConnectionError("provider down")
+
+    current = store.current
+    assert SnapshotRefresher(store, failing_load, interval=60).refresh() is False
+    assert store.current is current
+    assert client.get("/json").headers["ETag"] == test2.headers["ETag"]
+
+    # The jitter keeps every delay within ±10% of the interval.
+    assert all(54 <= refresher.next_delay() <= 66 for _ in range(100))
+
+
+def test_stream_query():
+    dataframe = pd.DataFrame(
+        {
+            "ChampionId": [1, 202, 1, 99],
+            "Role": ["Mid", "ADC", "Support", "Mid"],
+            "ChampionName": ["Annie", "Jhin", "Annie", "Zed"],
+            "TotalGames": [100, 400, 50, 0],
+            "Winrate": [51.2, 49.0, 55.0, np.nan],
+        }
+    ).set_index(["ChampionId", "Role"])
+    client = create_app(Snapshot.from_dataframe(dataframe)).test_client()
+
+    test1 = client.get("/json?champion=annie,202&sort=-winrate")
+    assert [row["Winrate"] for row in test1.json] == [55.0, 51.2, 49.0]
+    assert test1.headers["X-Total-Count"] == "3"
+
+    # The index stays in the rows whatever fields are asked for.
+    test2 = client.get("/json?role=mid&min_games=1&fields=ChampionName")
+    assert test2.json == [{"ChampionId": 1, "Role": "Mid", "ChampionName": "Annie"}]
+
+    # NaNs never match a threshold and stay last in both directions.
+    test3 = client.get("/json?max_winrate=100&sort=-winrate&limit=2")
+    assert [row["ChampionId"] for row in test3.json] == [1, 1]
+    assert test3.headers["X-Total-Count"] == "3"
+
+    link, _, rel = test3.headers["Link"].partition(">; ")
+    assert rel == 'rel="next"'
+    test4 = client.get(link.lstrip("<"))
+    assert [row["ChampionName"] for row in test4.json] == ["Jhin"]
+    assert test4.headers["X-Offset"] == "2" and "Link" not in test4.headers
+
+    test5 = client.get(
+        "/json?max_winrate=100&sort=-winrate&limit=2",
+        headers={"If-None-Match": test3.headers["ETag"]},
+    )
+    assert test5.status_code == 304
+
+    test6 = client.get("/?sort=totalgames&limit=1")
+    assert b"Zed" in test6.data and b"Jhin" not in test6.data
+    assert b"<th>ChampionId</th>" in test6.data
+
+    assert client.get("/json?sort=season").status_code == 400
+    assert client.get("/json?tier=gold").status_code == 400
+    assert client.get("/json?limit=0").status_code == 400
+
+    # Cache busters are ignored, the query still gets its own ETag.
+    test7 = client.get("/json?role=mid&_=1697650000")
+    assert test7.status_code == 200 and test7.headers["X-Total-Count"] == "2"
+
+    # Alone, they get the pre-rendered snapshot, in the same shape as a query.
+    test8 = client.get("/json?_=1697650000")
+    assert test8.headers["ETag"] == client.get("/json").headers["ETag"]
+    assert len(test8.json) == 4 and test8.json[0] == test1.json[1]
+
+    # A single index keeps pandas' column orient, filtered or not.
+    single = create_app(
+        Snapshot.from_dataframe(dataframe.xs("Mid", level="Role"))
+    ).test_client()
+    test9 = single.get("/json?sort=-totalgames&fields=Winrate")
+    assert test9.json == {"Winrate": {"1": 51.2, "99": None}}
+    assert single.get("/json").json["Winrate"]["1"] == 51.2
+    assert b"<th>ChampionId</th>" in single.get("/?champion=zed").data
+
+
+def test_trace(tmp_path):
+    dataframe = pd.DataFrame(
+        {"ChampionName": ["Annie", "Jhin"], "Winrate": [51.2, 49.0]},
+        index=pd.Index([1, 202], name="ChampionId"),
+    )
+    tracer = profiling.enable()
+    try:
+        with profiling.stage("export") as record:
+            Snapshot.from_dataframe(dataframe)
+    finally:
+        profiling.disable()
+    profiling.write_trace(str(tmp_path / "trace.json"), tracer)
+
+    test1 = {stage.name: stage for stage in tracer.stages}
+    assert test1["stream_render"].rows == 2
+    assert test1["stream_render"].parent == "export"
+    assert test1["export"].wall >= test1["stream_render"].wall
+
+    with profiling.stage("fetch") as test2:
+        test2.rows = 1
+    assert len(tracer.stages) == 2
+    assert record.bytes is None
+    assert os.path.exists(tmp_path / "trace.json")
+
+
+def test_iter_array():
+    body = b'{"meta":{"data":[0]},"data":{"allChampionStats":[{"championId":1,"wins":5,"games":10,"role":"ADC"},{"championId":202,"wins":2.5e1,"games":-1,"role":"Mid"}]}}'
+    chunks = [body[i : i + 3] for i in range(0, len(body), 3)]
+
+    test1 = list(iter_array(chunks, ("data", "allChampionStats")))
+    assert [item["championId"] for item in test1] == [1, 202]
+    assert test1[1]["wins"] == 25.0
+
+    test2 = collect_columns(test1, ("championId", "games"), ("role",))
+    assert list(test2["championId"]) == [1, 202]
+    assert list(test2["games"]) == [10, -1]
+    assert test2["role"] == ["ADC", "Mid"]
+
+    with pytest.raises(ValueError) as test3:
+        list(iter_array([body[:-20]], ("data", "allChampionStats")))
+    assert "Truncated" in str(test3.value)
+
+    with pytest.raises(ValueError) as test4:
+        list(iter_array([body], ("data", "champions")))
+    assert "No array" in str(test4.value)
+
+
+def test_champion_columns():
+    names = names_dtype(("Annie", "Jhin"))
+    columns = ChampionColumns.from_arrays(
+        champion_id=np.array([202, 1]),
+        champion_name=pd.Categorical.from_codes([1, 0], dtype=names),
+        role=pd.Categorical(["ADC", "Mid"]),
+        total_games=np.array([10, 0]),
+        wins=np.array([4, 0]),
+        provider="OP.GG",
+    )
+
+    test1 = columns.to_dataframe()
+    assert test1["Winrate"].tolist() == [40.0, 0.0]
+    assert test1["Losses"].tolist() == [6, 0]
+    assert test1["ChampionName"].dtype == names
+    assert np.shares_memory(test1["Wins"].to_numpy(), columns.wins)
+
+    test2 = columns.concat(columns.take(np.array([0])))
+    assert len(test2) == 3
+    assert test2.unique().champion_id.tolist() == [202, 1]
+    assert columns.unique() is columns
+    assert test2.to_dict()["Provider"] == ["OP.GG"] * 3
+
+    # Providers are joined as typed columns, the combined frame keeps the categoricals.
+    blitz = ChampionColumns.from_arrays(
+        champion_id=np.array([1, 202]),
+        champion_name=pd.Categorical.from_codes([0, 1], dtype=names),
+        role=pd.Categorical(["Mid", "Top"]),
+        total_games=np.array([20, 5]),
+        wins=np.array([12, 1]),
+        provider="BLITZ.GG",
+    )
+    test3 = _combined_dataframe([columns, blitz])
+    assert test3.index.names == ["ChampionId", "Provider"]
+    assert test3["Role"].dtype == "category"
+    assert test3["ChampionName"].dtype == names
+    assert test3["Winrate"].tolist() == [60.0, 40.0, 20.0, 0.0]
+
+
+def test_role_pivots():
+    dataframe = pd.DataFrame(
+        {
+            "ChampionId": [202, 202, 1],
+            "Role": ["ADC", "Mid", "Mid"],
+            "ChampionName": ["Jhin", "Jhin", "Annie"],
+            "TotalGames": [300, 100, 0],
+            "Winrate": [52.0, 48.0, 0.0],
+        }
+    ).set_index(["ChampionId", "Role"])
+
+    test1 = add_role_share(dataframe)
+    assert test1["RoleShare"].tolist() == [75.0, 25.0, 0.0]
+
+    test2 = role_pivots(test1)
+    assert test2["RoleShare"].loc[(202, "Jhin"), "ADC"] == 75.0
+    assert test2["Winrate"].loc[(202, "Jhin"), "Mid"] == 48.0
+    assert pd.isna(test2["Winrate"].loc[(1, "Annie"), "ADC"])
+
+
+def test_archive(tmp_path, monkeypatch):
+    from services import registry
+
+    dataframe = pd.DataFrame(
+        {
+            "ChampionId": [1, 202, 1, 202],
+            "ChampionName": ["Annie", "Jhin", "Annie", "Jhin"],
+            "Role": ["-", "-", "Mid", "ADC"],
+            "TotalGames": [100, 200, 300, 400],
+            "Wins": [50, 110, 160, 190],
+            "Losses": [50, 90, 140, 210],
+            "Winrate": [50.0, 55.0, 53.33, 47.5],
+            "Provider": ["OP.GG", "OP.GG", "BLITZ.GG", "BLITZ.GG"],
+        }
+    ).set_index(["ChampionId", "Provider"])
+
+    with Archive(str(tmp_path / "archive.sqlite3")) as archive:
+        test1 = archive.append(dataframe, patch="13.14")
+        assert len(test1) == 2
+
+        test2 = archive.append(dataframe, patch="13.14")
+        assert test2 == []
+
+        # Rows are never overwritten, a duplicate key fails the whole append.
+        duplicated = pd.concat([dataframe, dataframe.iloc[:1]])
+        with pytest.raises(sqlite3.IntegrityError):
+            archive.append(duplicated, patch="13.14")
+        assert len(archive.snapshots()) == 2
+
+        test3 = archive.query(champion="jhin", provider="BLITZ.GG")
+        assert test3["Winrate"].tolist() == [47.5]
+        assert test3["Patch"].tolist() == ["13.14"]
+
+        test4 = archive.query(champion=1, start="2000-01-01", end="2000-12-31")
+        assert test4.empty
+
+        # Without --patch, the snapshots go to the patch of the synced assets.
+        assets_dir = tmp_path / "assets"
+        monkeypatch.setattr(registry, "ASSETS_DIR", str(assets_dir))
+        archive.append(dataframe.iloc[:1])
+        assert archive.snapshots()["Patch"].iloc[-1] == "unknown"
+
+        os.makedirs(assets_dir)
+        (assets_dir / "manifest.json").write_text('{"current": "13.15.1"}')
+        archive.append(dataframe.iloc[:1])
+        assert archive.snapshots()["Patch"].iloc[-1] == "13.15.1"
+
+
+def test_export_to_many(tmp_path):
+    dataframe = pd.DataFrame(
+        {"ChampionName": ["Annie", "Jhin"], "Winrate": [51.2, 49.0]},
+        index=pd.Index([1, 202], name="ChampionId"),
+    )
+    os.makedirs(tmp_path / "data")
+    date_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+    test1 = export_to_many(dataframe, date_time, ["csv", "ndjson", "txt"], tmp_path)
+    assert list(test1) == ["csv", "ndjson", "txt"]
+    for export_type, file_path in test1.items():
+        assert os.path.isfile(file_path) == True
+        assert os.path.splitext(file_path)[1][1:] == export_type
+    assert pd.read_json(test1["ndjson"], lines=True)["ChampionId"].tolist() == [1, 202]
+
+    test6 = export_to(
+        dataframe.assign(Provider="OP.GG").set_index("Provider", append=True),
+        date_time,
+        "json",
+        tmp_path,
+    )
+    assert pd.read_json(test6)[["ChampionId", "Provider"]].values.tolist() == [
+        [1, "OP.GG"],
+        [202, "OP.GG"],
+    ]
+
+    with pytest.raises(ValueError) as test2:
+        export_to_many(dataframe, date_time, ["csv", "invalid"], tmp_path)
+    assert "Invalid type" in str(test2.value)
+
+    test4 = export_to(
+        dataframe.assign(Role=["Mid", "ADC"]),
+        date_time,
+        "xlsx",
+        tmp_path,
+        sheet_by="Role",
+    )
+    assert list(pd.read_excel(test4, sheet_name=None)) == ["ADC", "Mid"]
+
+    test5 = export_to(
+        dataframe.astype({"ChampionName": "category"}), date_time, "xlsx", tmp_path
+    )
+    assert pd.read_excel(test5)["ChampionName"].tolist() == ["Annie", "Jhin"]
+
+    pytest.importorskip("pyarrow")
+    test3 = export_to_many(dataframe, date_time, ["parquet", "feather"], tmp_path)
+    assert pd.read_parquet(test3["parquet"]).equals(dataframe)
+    assert pd.read_feather(test3["feather"])["ChampionName"].tolist() == [
+        "Annie",
+        "Jhin",
+    ]
+
+
+def test_plot_data_many(tmp_path):
+    dataframe = pd.DataFrame(
+        {
+            "ChampionName": ["Annie", "Jhin", "Lulu"],
+            "Role": ["Mid", "ADC", "Support"],
+            "Winrate": [51.2, 49.0, 50.5],
+        },
+        index=pd.Index([1, 202, 117], name="ChampionId"),
+    )
+    original = dataframe.copy()
+    os.makedirs(tmp_path / "plots")
+    date_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+    test1 = plot_data_many(dataframe, date_time, tmp_path, "svg", by="Role", top=2)
+    assert len(test1) == 4
+    for plot_path in test1:
+        assert os.path.isfile(plot_path) == True
+        assert os.path.splitext(plot_path)[1][1:] == "svg"
+    assert dataframe.equals(original)
+
+    with pytest.raises(ValueError) as test2:
+        plot_data_many(dataframe, date_time, tmp_path, "gif")
+    assert "Invalid plot format" in str(test2.value)
+
+
+def test_asset_sync(tmp_path, monkeypatch):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from threading import Thread
+
+    import requests
+
+    from services import assets, registry
+
+    requests_seen = []
+
+    versions_down = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(self.path)
+            if versions_down and self.path == "/versions":
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            if self.path == "/versions":
+                body = b'["13.1.1", "12.23.1"]'
+            else:
+                body = b'{"data": {"Annie": {"key": "1", "name": "Annie"}}}'
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setattr(registry, "ASSETS_DIR", str(tmp_path))
+    monkeypatch.setattr(assets, "VERSIONS_URL", f"{url}/versions")
+    monkeypatch.setattr(assets, "CHAMPIONS_URL", url + "/{patch}/champion.json")
+    monkeypatch.setattr(assets, "_versions_failed_at", None)
+
+    try:
+        test1 = assets.sync()
+        assert test1.patch == "13.1.1" and test1.champions == 1
+        assert os.path.exists(registry.names_path())
+        assert os.path.exists(registry.names_path("13.1.1"))
+        assert assets.current_patch() == "13.1.1"
+        assert requests_seen == ["/versions", "/13.1.1/champion.json"]
+
+        # The latest patch is trusted for VERSIONS_TTL and its artifacts are reused.
+        test2 = assets.sync()
+        assert test2.sha256 == test1.sha256
+        assert len(requests_seen) == 2
+
+        # A pinned patch is synced on its own, the top level assets stay on the latest.
+        assets.sync("12.23.1")
+        assert assets.current_patch() == "13.1.1"
+        assert os.path.exists(registry.names_path("12.23.1"))
+
+        # Forcing revalidates, a 304 rebuilds from the local champion.json.
+        test3 = assets.sync("12.23.1", force=True)
+        assert test3.etag == '"v1"' and test3.champions == 1
+        assert requests_seen[-1] == "/12.23.1/champion.json"
+
+        # A failed check counts as one, the last known patch is used until the TTL is up.
+        versions = assets.VersionsManifest.load()
+        versions.checked_at = 0
+        versions.save(assets.current_patch())
+        versions_down.append(True)
+        assert assets.versions_due()
+        with pytest.raises(requests.HTTPError):
+            assets.sync(session=requests.Session())
+        assert not assets.versions_due()
+        checks = len(requests_seen)
+        assert assets.sync(session=requests.Session()).patch == "13.1.1"
+        assert len(requests_seen) == checks
+    finally:
+        server.shutdown()
+
+
+def test_champions_resync(tmp_path, monkeypatch):
+    from services import assets, registry, utils
+    from services.opgg import OPGG
+
+    path = tmp_path / "champions_names_by_id.json"
+    path.write_text('{"1": "Annie"}')
+    syncs = []
+
+    def sync(patch, session, headers, timeout, force=False):
+        syncs.append((patch, force))
+        if force:
+            path.write_text('{"1": "Annie", "202": "Jhin"}')
+
+    monkeypatch.setattr(registry, "ASSETS_DIR", str(tmp_path))
+    monkeypatch.setattr(utils, "sync_assets", sync)
+    monkeypatch.setattr(assets, "_versions_failed_at", None)
+    registry.clear_registries()
+    try:
+        # Unpinned runs sync every time, offline ones never do.
+        OPGG(cache=None, offline=True)
+        assert syncs == []
+        service = OPGG(cache=None)
+        assert syncs == [(None, False)]
+
+        # A champion missing from the assets forces one resync, then it is known.
+        records = [{"champion_id": 202, "play": 10, "win": 5}]
+        service._sanitize_records(records, **service.record_keys)
+        assert syncs == [(None, False), (None, True)]
+        assert service.columns.to_dict()["ChampionName"] == ["Jhin"]
+
+        with pytest.raises(KeyError, match="Unknown champions IDs"):
+            service._sanitize_records(
+                [{"champion_id": 99, "play": 1, "win": 1}], **service.record_keys
+            )
+        assert len(syncs) == 2
+    finally:
+        registry.clear_registries()
+
+
+def test_consensus(tmp_path):
+    dataframe = pd.DataFrame(
+        {
+            "ChampionId": [1, 202, 1, 202],
+            "ChampionName": ["Annie", "Jhin", "Annie", "Jhin"],
+            "Role": ["Mid", "ADC", "Mid", "ADC"],
+            "TotalGames": [100, 0, 300, 400],
+            "Wins": [50, 0, 160, 190],
+            "Losses": [50, 0, 140, 210],
+            "Winrate": [50.0, 0.0, 53.33, 47.5],
+            "Provider": ["OP.GG", "OP.GG", "BLITZ.GG", "BLITZ.GG"],
+        }
+    ).set_index(["ChampionId", "Provider"])
+
+    test1 = consensus(dataframe)
+    assert test1.index.tolist() == [1, 202]
+    assert test1["Winrate"].tolist() == [52.5, 47.5]
+    assert test1["Providers"].tolist() == [2, 2]
+    assert test1.loc[1, "Winrate OP.GG"] == 50.0
+    # Jhin has no OP.GG games, which leaves the spread to Annie.
+    assert test1["WinrateSpread"].tolist() == [3.33, 0.0]
+    assert (test1["WilsonLower"] < test1["Winrate"]).all()
+    assert (test1["WilsonUpper"] > test1["Winrate"]).all()
+    assert test1.loc[1, "BayesLower"] < test1.loc[1, "BayesWinrate"] < 52.5
+    assert test1.loc[202, "PickRate"] == 400 / 80 * 100
+
+    with Archive(str(tmp_path / "archive.sqlite3")) as archive:
+        archive.append(dataframe, patch="13.14", captured_at=datetime(2023, 7, 1))
+        archive.append(
+            dataframe.assign(Wins=dataframe["Wins"] + 1),
+            patch="13.14",
+            captured_at=datetime(2023, 7, 1, 12),
+        )
+        archive.append(dataframe, patch="13.14", captured_at=datetime(2023, 7, 2))
+
+        # The last capture of a day stands for it.
+        test2 = consensus(archive.query())
+        assert test2.index.names == ["Patch", "Date", "ChampionId"]
+        assert test2.loc[("13.14", "2023-07-01", 1), "Wins"] == 212
+        assert test2.loc[("13.14", "2023-07-02", 1), "Wins"] == 210
+
+        # Archived per-role snapshots keep Role as a column, it still splits the rows.
+        per_role = pd.concat(
+            [dataframe, dataframe.iloc[[0, 2]].assign(Role="Top", Wins=40)]
+        ).set_index("Role", append=True)
+        archive.append(per_role, patch="13.15", captured_at=datetime(2023, 7, 3))
+        test3 = consensus(archive.query(patch="13.15"))
+        assert test3.index.names == ["Patch", "Date", "ChampionId", "Role"]
+        assert len(test3) == 3 and test3["Providers"].tolist() == [2, 2, 2]
+        assert test3.loc[("13.15", "2023-07-03", 1, "Top"), "Wins"] == 80
+
+    # Sweep cells only join on the dimensions every provider fills.
+    sweep = pd.concat(
+        [
+            dataframe.assign(
+                Tier=tier,
+                Position="-",
+                Period="month" if provider == "OP.GG" else "-",
+                Region="-" if provider == "OP.GG" else "world",
+                Queue="-" if provider == "OP.GG" else "ranked_solo",
+            ).xs(provider, level="Provider", drop_level=False)
+            for tier in ("gold", "diamond")
+            for provider in ("OP.GG", "BLITZ.GG")
+        ]
+    )
+    test4 = consensus(sweep)
+    assert test4.index.names == ["Tier", "ChampionId"]
+    assert len(test4) == 4 and (test4["Providers"] == 2).all()
+
+    # A dimension only OP.GG has can't be dropped once it varies.
+    weekly = sweep.xs("OP.GG", level="Provider", drop_level=False).assign(Period="week")
+    with pytest.raises(ValueError, match='Only some providers have a "Period"'):
+        consensus(pd.concat([sweep, weekly]))
+
+
+def test_batch_jobs(tmp_path):
+    job_file = tmp_path / "jobs.toml"
+    job_file.write_text(
+        """
+[defaults]
+per_role = true
+
+[[jobs]]
+provider = "op.gg"
+type = ["csv", "json"]
+
+[[jobs]]
+name = "everything"
+provider = "all"
+plot = true
+path = "results/daily"
+
+[[jobs]]
+name = "tiers"
+provider = "blitz.gg"
+type = "csv"
+sweep = { tier = ["platinum_plus", "diamond_plus"] }
+"""
+    )
+
+    test1 = get_args(["--batch", str(job_file)])
+    assert [job.name for job in test1.batch] == ["op.gg", "everything", "tiers"]
+    assert test1.batch[0].args.type == "csv,json"
+    assert test1.batch[0].path == "results/op.gg"
+    assert test1.batch[1].path == "results/daily"
+    assert all(job.args.per_role for job in test1.batch)
+    assert test1.batch[2].args.sweep == {"tier": ["platinum_plus", "diamond_plus"]}
+
+    # The op.gg call is shared by the first two jobs.
+    classes = {provider: get_provider_class(provider) for provider in PROVIDERS}
+    fetches = [fetch for job in test1.batch for fetch in job.fetches(classes)]
+    assert len(fetches) == 5
+    assert len(set(fetches)) == 4
+
+    job_file.write_text('[[jobs]]\nprovider = "op.gg"\nstream = true\n')
+    with pytest.raises(argparse.ArgumentError) as test2:
+        get_args(["--batch", str(job_file)])
+    assert '"stream" can not be used in a batch job' in str(test2.value)
+
+    job_file.write_text('[[jobs]]\nprovider = "op.gg"\ntype = "yaml"\n')
+    with pytest.raises(argparse.ArgumentError) as test3:
+        get_args(["--batch", str(job_file)])
+    assert 'Invalid job "op.gg"' in str(test3.value)
+
+    job_file.write_text('[[jobs]]\nname = "typo"\nprovider = "op.gg"\ntypes = "csv"\n')
+    with pytest.raises(argparse.ArgumentError) as test4:
+        get_args(["--batch", str(job_file)])
+    assert 'Invalid job "typo": Unknown option: "types"' in str(test4.value)
+
+    job_file.write_text('[[jobs]]\nname = "empty"\nprovider = "op.gg"\n')
+    with pytest.raises(argparse.ArgumentError) as test5:
+        get_args(["--batch", str(job_file)])
+    assert 'Invalid job "empty": nothing to write' in str(test5.value)
+
+    job_file.write_text(
+        '[[jobs]]\nname = "workers"\nprovider = "op.gg"\ntype = "csv"\nworkers = "x"\n'
+    )
+    with pytest.raises(argparse.ArgumentError) as test6:
+        get_args(["--batch", str(job_file)])
+    assert 'Invalid job "workers"' in str(test6.value)
+
+    # Per-run options belong to the jobs, only the batch's own ones are accepted.
+    job_file.write_text('[[jobs]]\nprovider = "op.gg"\ntype = "csv"\n')
+    test7 = get_args(["--batch", str(job_file), "--workers", "8", "--profile"])
+    assert test7.workers == 8 and test7.profile
+    for argv in (["op.gg"], ["--stream"], ["--refresh", "5"], ["-t", "xlsx"]):
+        with pytest.raises(argparse.ArgumentError) as test8:
+            get_args(["--batch", str(job_file), *argv])
+        assert "can not be used with --batch" in str(test8.value)
+
+
+def test_export_changed(tmp_path):
+    dataframe = pd.DataFrame(
+        {"ChampionName": ["Annie", "Jhin"], "Winrate": [51.2, 49.0]},
+        index=pd.Index([1, 202], name="ChampionId"),
+    )
+    os.makedirs(tmp_path / "data")
+
+    test1, references = export_changed(dataframe, "1", ["csv", "json"], tmp_path)
+    assert list(test1) == ["csv", "json"] and references == {}
+    assert sorted(os.listdir(tmp_path / "data")) == [
+        "manifest.json",
+        "results_1.csv",
+        "results_1.json",
+    ]
+
+    # Identical data refers back to the previous files, new types are still written.
+    test2, references = export_changed(dataframe, "2", ["csv", "txt"], tmp_path)
+    assert list(test2) == ["txt"]
+    assert references == {"csv": test1["csv"]}
+
+    changed = dataframe.assign(Winrate=[51.2, 50.5])
+    test3, references = export_changed(changed, "3", ["csv"], tmp_path, delta=True)
+    assert pd.read_csv(test3["csv"])["ChampionId"].tolist() == [202]
+    assert test3["csv"].endswith("results_3_delta.csv")
+
+    test4, _ = export_changed(changed, "4", ["csv"], tmp_path, delta=True)
+    assert test4 == {}
+    assert not any(".tmp" in name for name in os.listdir(tmp_path / "data"))
+
+
+def test_response_cache(tmp_path, monkeypatch):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from threading import Thread
+
+    import requests
+
+    from services import registry, utils
+    from services.cache import ResponseCache
+    from services.opgg import OPGG
+
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(self.headers.get("If-None-Match"))
+            if self.path.startswith("/missing"):
+                self.send_response(404)
+                self.end_headers()
+                return
+            if self.path.startswith("/truncated"):
+                body = b'{"data": [{"champion_id": 1'
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = b'{"data": [{"champion_id": 1, "play": 10, "win": 6}]}'
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    closed = []
+
+    class Session(requests.Session):
+        def get(self, *args, **kwargs):
+            response = super().get(*args, **kwargs)
+            close = response.close
+
+            def tracked_close():
+                closed.append(response.status_code)
+                close()
+
+            response.close = tracked_close
+            return response
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    (tmp_path / "champions_names_by_id.json").write_text('{"1": "Annie"}')
+    monkeypatch.setattr(registry, "ASSETS_DIR", str(tmp_path))
+    monkeypatch.setattr(utils, "sync_assets", lambda *args: None)
+    registry.clear_registries()
+
+    cache = ResponseCache(str(tmp_path / "responses"), ttl=60)
+    service = OPGG(session=Session(), cache=cache)
+    params = {"tier": "gold"}
+    key = ResponseCache.key(service.provider, f"{url}/stats", params)
+    try:
+        test1 = service._fetch_json(f"{url}/stats", params)
+        assert test1["data"][0]["champion_id"] == 1
+        assert requests_seen == [None]
+
+        # Fresh entries are served without a request.
+        assert service._fetch_json(f"{url}/stats", params) == test1
+        assert len(requests_seen) == 1
+
+        # Stale ones are revalidated, a 304 closes the streamed response and
+        # restarts the entry's TTL.
+        cache.ttl = 0
+        test2 = service._fetch_records(f"{url}/stats", params)
+        assert list(test2["champion_id"]) == [1]
+        assert requests_seen[-1] == '"v1"'
+        assert closed == [304]
+        cache.ttl = 60
+        assert cache.is_fresh(cache.get(key))
+
+        with pytest.raises(requests.HTTPError):
+            service._request("missing", f"{url}/missing", {}, stream=True)
+        assert closed == [304, 404]
+
+        # A body that fails to parse still releases its connection.
+        with pytest.raises(ValueError):
+            service._fetch_records(f"{url}/truncated", params)
+        assert closed == [304, 404, 200]
+
+        # Offline runs only replay, whatever the entry's age.
+        service.offline = True
+        cache.ttl = 0
+        requests_count = len(requests_seen)
+        assert service._fetch_json(f"{url}/stats", params) == test1
+        assert len(requests_seen) == requests_count
+        with pytest.raises(FileNotFoundError):
+            service._fetch_json(f"{url}/stats", {"tier": "iron"})
+    finally:
+        server.shutdown()
+        registry.clear_registries()
+
+    # The least recently used entries are evicted first, reads count as use.
+    lru = ResponseCache(str(tmp_path / "lru"), max_bytes=10)
+    lru.put("a", b"aaaa")
+    lru.put("b", b"bbbb")
+    os.utime(tmp_path / "lru" / "a.body", (1, 1))
+    os.utime(tmp_path / "lru" / "b.body", (2, 2))
+    assert lru.get("a").body == b"aaaa"
+    lru.put("c", b"cccc")
+    assert lru.get("b") is None
+    assert lru.get("a").body == b"aaaa" and lru.get("c").body == b"cccc"
+
+    # An entry evicted between its read and its touch is still served.
+    def evicted(path, *args):
+        os.remove(path)
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, "utime", evicted)
+    assert lru.get("c").body == b"cccc"
+    assert lru.get("c") is None
+
+
+def test_registry(tmp_path, monkeypatch):
+    from services import registry
+
+    monkeypatch.setattr(registry, "ASSETS_DIR", str(tmp_path))
+    registry.clear_registries()
+    path = tmp_path / "champions_names_by_id.json"
+    path.write_text('{"1": "Annie", "202": "Jhin", "22": "Ashe"}')
+
+    try:
+        test1 = registry.get_registry()
+        assert test1.ids == (1, 202, 22)
+        assert test1.names == ("Annie", "Jhin", "Ashe")
+        assert dict(test1.codes) == {1: 0, 202: 1, 22: 2}
+        assert test1.names_by_id["202"] == "Jhin"
+        assert len(test1) == 3 and 22 in test1 and 99 not in test1
+
+        # Parsed once, the same object is shared until the file changes.
+        assert registry.get_registry() is test1
+        path.write_text('{"1": "Annie", "202": "Jhin", "22": "Ashe", "99": "Lux"}')
+        test2 = registry.get_registry()
+        assert test2 is not test1 and test2.codes[99] == 3
+
+        registry.clear_registries()
+        assert registry.get_registry() is not test2
+
+        with pytest.raises(FileNotFoundError):
+            registry.get_registry("1.1.1")
+    finally:
+        registry.clear_registries()
+
+
+def test_transport(monkeypatch):
+    import socket
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from threading import Thread
+
+    import requests
+
+    from services.ratelimit import HostRateLimiter
+    from services.transport import JitteredRetry, create_session
+
+    hits = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits[self.path] = hits.get(self.path, 0) + 1
+            if self.path == "/down" or hits[self.path] <= 2:
+                if self.path == "/down":
+                    self.send_response(500)
+                else:
+                    self.send_response(429)
+                    self.send_header("Retry-After", "7")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    class Limiter:
+        def __init__(self):
+            self.urls = []
+
+        def acquire(self, url):
+            self.urls.append(url)
+            return 0.0
+
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    limiter = Limiter()
+    session = create_session(retries=3, backoff_factor=1.0, rate_limiter=limiter)
+    try:
+        # Retry-After takes precedence over the backoff, every attempt waits for the limiter.
+        test1 = session.get(f"{url}/flaky")
+        assert test1.status_code == 200 and test1.text == "ok"
+        assert hits["/flaky"] == 3
+        assert sleeps == [7, 7]
+        assert limiter.urls == [f"{url}/flaky"] * 3
+
+        # Out of retries, the last response is handed back.
+        sleeps.clear()
+        test2 = session.get(f"{url}/down")
+        assert test2.status_code == 500
+        assert hits["/down"] == 4 and len(limiter.urls) == 7
+        assert len(sleeps) == 2 and 1 <= sleeps[0] <= 2 and 2 <= sleeps[1] <= 4
+    finally:
+        server.shutdown()
+
+    # Connection errors are retried through the limiter too, then raised.
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    with pytest.raises(requests.ConnectionError):
+        session.get(f"http://127.0.0.1:{port}/")
+    assert len(limiter.urls) == 11
+
+    # Full jitter: the third attempt waits between half and all of the 4s backoff.
+    retry = JitteredRetry(total=5, backoff_factor=1.0)
+    assert retry.get_backoff_time() == 0.0
+    for _ in range(3):
+        retry = retry.increment("GET", "/")
+    test3 = [retry.get_backoff_time() for _ in range(100)]
+    assert all(2 <= backoff <= 4 for backoff in test3)
+    assert len(set(test3)) > 1
+
+    monkeypatch.undo()
+    # A burst of two, then one token every 50ms for each host on its own.
+    rate_limiter = HostRateLimiter(rate=20.0, burst=2.0)
+    test4 = [rate_limiter.acquire("http://a.test/x") for _ in range(4)]
+    assert test4[:2] == [0.0, 0.0] and all(waited > 0 for waited in test4[2:])
+    assert rate_limiter.acquire("http://b.test/x") == 0.0